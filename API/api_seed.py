@@ -29,6 +29,25 @@ def wait_for_api():
         time.sleep(2)
     raise Exception("API not available after 60 seconds")
 
+def bulk_create(collection, rows, label_key=None):
+    """Create rows with a single bulk request and return the created ones with their new IDs"""
+    response = requests.post(f"{API_BASE}/{collection}/bulk", json=rows)
+    if response.status_code not in [200, 201]:
+        print(f"Failed to create {collection} (status {response.status_code}): {response.text}")
+        return []
+    
+    result = response.json()
+    for error in result["errors"]:
+        row = rows[error["index"]]
+        print(f"Failed to create {row.get(label_key, row) if label_key else row}: {error['detail']}")
+    
+    created = []
+    for row, new_id in zip(rows, result["created_ids"]):
+        if new_id is not None:
+            created.append({**row, "id": new_id})
+    print(f"Created {len(created)} {collection}")
+    return created
+
 def create_developers():
     """Create 5 developers via API"""
     developers = [
@@ -39,17 +58,7 @@ def create_developers():
         {"name": "Eva Brown", "email": "eva@example.com"},
     ]
     
-    created_devs = []
-    for dev_data in developers:
-        response = requests.post(f"{API_BASE}/developers/", json=dev_data)
-        print(f"Developer creation status: {response.status_code}")
-        if response.status_code in [200, 201]:
-            created_devs.append(response.json())
-            print(f"Created developer: {dev_data['name']}")
-        else:
-            print(f"Failed to create developer {dev_data['name']} (status {response.status_code}): {response.text}")
-    
-    return created_devs
+    return bulk_create("developers", developers, "name")
 
 def create_cloud_resources():
     """Create cloud resources via API"""
@@ -60,21 +69,12 @@ def create_cloud_resources():
         "GCP": ["BigQuery", "Compute Engine", "Cloud Storage", "Cloud SQL", "Pub/Sub"]
     }
     
-    all_resources = []
-    for cloud in cloud_types:
-        for name in resource_names[cloud]:
-            resource_data = {
-                "name": f"{cloud} {name}",
-                "cloud_type": cloud
-            }
-            response = requests.post(f"{API_BASE}/cloud_resources/", json=resource_data)
-            if response.status_code in [200, 201]:
-                all_resources.append(response.json())
-                print(f"Created resource: {resource_data['name']}")
-            else:
-                print(f"Failed to create resource {resource_data['name']} (status {response.status_code}): {response.text}")
-    
-    return all_resources
+    resources = [
+        {"name": f"{cloud} {name}", "cloud_type": cloud}
+        for cloud in cloud_types
+        for name in resource_names[cloud]
+    ]
+    return bulk_create("cloud_resources", resources, "name")
 
 def assign_resources_to_developers(developers, resources):
     """Assign 2-5 resources per cloud to each developer"""
@@ -85,7 +85,7 @@ def assign_resources_to_developers(developers, resources):
             resources_by_cloud[cloud] = []
         resources_by_cloud[cloud].append(resource)
     
-    assignments = []
+    permissions = []
     permission_choices = ["READ", "WRITE", "RW"]
     
     for dev in developers:
@@ -96,21 +96,13 @@ def assign_resources_to_developers(developers, resources):
             assigned_resources = random.sample(cloud_resources, num_resources)
             
             for resource in assigned_resources:
-                # Create permission record (which should also create the link)
-                permission_data = {
+                permissions.append({
                     "resource_id": resource["id"],
                     "developer_id": dev["id"],
                     "permission": random.choice(permission_choices)
-                }
-                
-                response = requests.post(f"{API_BASE}/permissions/", json=permission_data)
-                if response.status_code in [200, 201]:
-                    assignments.append(response.json())
-                    print(f"  Assigned {resource['name']} with {permission_data['permission']} permission")
-                else:
-                    print(f"  Failed to assign {resource['name']} (status {response.status_code}): {response.text}")
-    
-    return assignments
+                })
+    
+    return bulk_create("permissions", permissions)
 
 def main():
     """Main seeding function"""
@@ -119,6 +111,11 @@ def main():
     # Wait for API to be ready
     wait_for_api()
     
+    # Migrations keep data across restarts, so only seed an empty database
+    if requests.get(f"{API_BASE}/developers/", params={"limit": 1}).json():
+        print("Database already has data, skipping seeding.")
+        return
+    
     # Create developers
     print("\n1️⃣ Creating developers...")
     developers = create_developers()
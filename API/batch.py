@@ -0,0 +1,32 @@
+from typing import Dict, List
+
+from fastapi import HTTPException
+from sqlalchemy import ARRAY, Integer, any_, bindparam
+from sqlalchemy.orm import Session
+
+# Most ids a single batch request may ask for
+MAX_BATCH_IDS = 1000
+
+def parse_ids(ids: str) -> List[int]:
+    """Parse ids=1,2,3 from a query string"""
+    try:
+        return [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+
+def ids_filter(db: Session, id_column, ids: List[int]):
+    """WHERE id = ANY(:ids) on Postgres, a single array parameter whatever the batch size; IN elsewhere"""
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    if db.get_bind().dialect.name == "postgresql":
+        return id_column == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+    return id_column.in_(ids)
+
+def batch_result(rows, ids: List[int]) -> Dict:
+    """Order the fetched rows as the ids were requested (repeats collapsed) and list the ids not found"""
+    by_id = {row.id: row._asdict() for row in rows}
+    ordered = list(dict.fromkeys(ids))
+    return {
+        "items": [by_id[item_id] for item_id in ordered if item_id in by_id],
+        "missing_ids": [item_id for item_id in ordered if item_id not in by_id],
+    }
@@ -0,0 +1,27 @@
+from typing import Dict, Iterator, List, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# Rows per INSERT statement; keeps parameter counts well under driver limits
+BULK_CHUNK_SIZE = 1000
+
+def chunked(rows: Sequence, size: int = BULK_CHUNK_SIZE) -> Iterator[Sequence]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def _insert_returning_ids(model):
+    return insert(model).returning(model.id, sort_by_parameter_order=True)
+
+def insert_returning_ids(db: Session, model, rows: List[Dict]) -> List[int]:
+    """Insert rows with one statement and return their new ids in input order"""
+    if not rows:
+        return []
+    return list(db.scalars(_insert_returning_ids(model), rows))
+
+async def async_insert_returning_ids(db: AsyncSession, model, rows: List[Dict]) -> List[int]:
+    """Async counterpart of insert_returning_ids"""
+    if not rows:
+        return []
+    return list(await db.scalars(_insert_returning_ids(model), rows))
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Hashable, Iterable, List, Mapping, Optional, Tuple
+
+from change_stream import ChangeBroadcaster
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from versions import check_etag
+
+CACHE_ENABLED = os.getenv("API_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+CACHE_TTL_SECONDS = float(os.getenv("API_CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+class ResponseCache:
+    """LRU cache of serialized read responses, bounded by entry count, TTL and total bytes
+
+    Entries carry tags such as ("developer", 3); write handlers invalidate the tags they touch, and
+    follow_changes invalidates the tags of writes made through other workers. Each entry keeps the ETag it
+    was stored with, so a hit, 304 included, is answered without touching the database.
+    """
+
+    def __init__(self, enabled: bool, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._adapters = {}
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()  # key -> (expires_at, body, tags, etag)
+            self._keys_by_tag = defaultdict(set)
+            self._bytes = 0
+            self._generation = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+
+    def generation(self) -> int:
+        """Capture before querying; store() drops results read while an invalidation ran"""
+        return self._generation
+
+    def get(self, key: Hashable, request: Optional[Request] = None) -> Optional[Response]:
+        """Return the cached response for key with the ETag it was stored with
+
+        Call it before reading table versions; when request's If-None-Match names the entry's ETag,
+        this raises the 304 instead.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, body, _, etag = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        response = Response(content=body, media_type="application/json")
+        if request is not None:
+            check_etag(request, response, etag)
+        return response
+
+    def store(
+        self,
+        key: Hashable,
+        response_model,
+        value,
+        tags: Iterable[Hashable],
+        generation: int,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> Response:
+        """Serialize value as response_model, cache it under key and return it as a response"""
+        adapter = self._adapters.get(response_model)
+        if adapter is None:
+            adapter = self._adapters[response_model] = TypeAdapter(response_model)
+        body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+        if self.enabled and len(body) <= self.max_bytes:
+            with self._lock:
+                if generation == self._generation:
+                    if key in self._entries:
+                        self._remove(key)
+                    tags = frozenset(tags)
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, body, tags, _etag(headers))
+                    self._bytes += len(body)
+                    for tag in tags:
+                        self._keys_by_tag[tag].add(key)
+                    while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                        self._remove(next(iter(self._entries)))
+                        self.evictions += 1
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, *tags: Hashable):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def invalidate_all(self):
+        """Drop every entry, and any result read before now that is still on its way to store()"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        _, body, tags, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+        for tag in tags:
+            keys = self._keys_by_tag[tag]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_tag[tag]
+
+def _etag(headers: Optional[Mapping[str, str]]) -> Optional[str]:
+    return headers.get("etag") if headers is not None else None
+
+# Tag prefix of each table the change log records
+_CHANGE_TAGS = {"developers": "developer", "cloud_resources": "cloud_resource", "permissions": "permission"}
+
+def change_tags(entry: Mapping) -> List[Tuple]:
+    """Tags a change log entry invalidates; a grant's data also names the developer whose list it joined"""
+    prefix = _CHANGE_TAGS.get(entry["table_name"])
+    if prefix is None:
+        return []
+    tags = [(prefix, entry["row_id"])]
+    if prefix == "permission" and entry["data"] is not None:
+        tags.append(("developer_permissions", entry["data"]["developer_id"]))
+    return tags
+
+async def follow_changes(cache: ResponseCache, broadcaster: ChangeBroadcaster, bind):
+    """Invalidate what every worker's writes touch by tailing the change log; runs until cancelled
+
+    Each (re)subscription starts from the latest entry, so the cache is emptied then: anything stored
+    before it could predate a write the subscription will never see.
+    """
+    while True:
+        subscription = await broadcaster.subscribe(bind)
+        if subscription is None:
+            await asyncio.sleep(broadcaster.poll_interval)
+            continue
+        try:
+            cache.invalidate_all()
+            while True:
+                entry = await subscription.queue.get()
+                if entry is None:
+                    break
+                cache.invalidate(*change_tags(entry))
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+def developer_permissions_tags(developer_id: int, permissions):
+    """Tags for a developer's grant list: the developer, each grant and each resource it embeds"""
+    tags = [("developer", developer_id), ("developer_permissions", developer_id)]
+    for permission in permissions:
+        tags.append(("permission", permission.id))
+        tags.append(("cloud_resource", permission.resource_id))
+    return tags
+
+response_cache = ResponseCache(CACHE_ENABLED, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
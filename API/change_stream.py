@@ -0,0 +1,148 @@
+import asyncio
+import os
+from typing import AsyncIterator, List, Optional
+
+import orjson
+from fastjson import schema_columns
+from models import ChangeLogEntry
+from schemas import ChangeLogEntryRead
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+# How often the change log is polled for new entries, shared by every subscriber in the process
+CHANGE_STREAM_POLL_SECONDS = float(os.getenv("API_CHANGE_STREAM_POLL_SECONDS", "0.5"))
+# Entries buffered per subscriber; a subscriber that falls this far behind is disconnected
+CHANGE_STREAM_BUFFER = int(os.getenv("API_CHANGE_STREAM_BUFFER", "1000"))
+# Idle streams send a comment this often so proxies keep them open and dead clients are noticed
+HEARTBEAT_SECONDS = 15
+# Entries read per query, when catching up and when polling
+CHANGE_BATCH_SIZE = 500
+
+_COLUMNS = schema_columns(ChangeLogEntryRead, ChangeLogEntry)
+
+def _changes_after(bind, seq: int) -> List[dict]:
+    query = select(*_COLUMNS).where(ChangeLogEntry.seq > seq).order_by(ChangeLogEntry.seq).limit(CHANGE_BATCH_SIZE)
+    with Session(bind) as db:
+        return [row._asdict() for row in db.execute(query)]
+
+def _latest_seq(bind) -> int:
+    with Session(bind) as db:
+        return db.scalar(select(func.max(ChangeLogEntry.seq))) or 0
+
+class Subscription:
+    """A subscriber's bounded buffer of change log entries; None marks that it was dropped"""
+
+    def __init__(self, buffer_size: int):
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = False
+
+    def deliver(self, entries: List[dict]):
+        for entry in entries:
+            try:
+                self.queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                self.drop()
+                return
+
+    def drop(self):
+        """Discard what is buffered and end the stream; the client resumes from its Last-Event-ID"""
+        if self.dropped:
+            return
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+class ChangeBroadcaster:
+    """Tails the change log with one poller per process and fans new entries out to every subscriber
+
+    The poller never waits on a subscriber: one whose buffer is full is dropped instead. Tailing the
+    table rather than hooking the write handlers means every worker process sees every worker's writes.
+    """
+
+    def __init__(self, poll_interval: float = CHANGE_STREAM_POLL_SECONDS, buffer_size: int = CHANGE_STREAM_BUFFER):
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._task = None
+        self._ready = None
+        # Last sequence number fanned out
+        self._seq = 0
+
+    async def subscribe(self, bind) -> Optional[Subscription]:
+        """Register a subscriber that receives every entry the poller reads from here on; None if polling failed"""
+        if self._task is None:
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._poll(bind))
+        task = self._task
+        await self._ready.wait()
+        if task.done():
+            return None
+        subscription = Subscription(self.buffer_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _poll(self, bind):
+        try:
+            self._seq = await run_in_threadpool(_latest_seq, bind)
+            self._ready.set()
+            while True:
+                entries = await run_in_threadpool(_changes_after, bind, self._seq)
+                if entries:
+                    self._seq = entries[-1]["seq"]
+                    for subscription in list(self._subscribers):
+                        subscription.deliver(entries)
+                if len(entries) < CHANGE_BATCH_SIZE:
+                    await asyncio.sleep(self.poll_interval)
+        except Exception:
+            # Without a poller nobody would hear of new changes; end every stream so clients reconnect
+            for subscription in list(self._subscribers):
+                subscription.drop()
+            self._subscribers.clear()
+            self._task = None
+            self._ready.set()
+
+change_broadcaster = ChangeBroadcaster()
+
+def _event(entry: dict) -> bytes:
+    return b"id: %d\ndata: %s\n\n" % (entry["seq"], orjson.dumps(entry))
+
+async def change_events(broadcaster: ChangeBroadcaster, bind, last_seq: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Server-sent events for change log entries after last_seq, or from now on when it is None
+
+    The subscription starts before the catch-up read, so nothing committed in between is missed;
+    entries seen in both are sent once.
+    """
+    subscription = await broadcaster.subscribe(bind)
+    if subscription is None:
+        return
+    try:
+        if last_seq is not None:
+            while True:
+                entries = await run_in_threadpool(_changes_after, bind, last_seq)
+                for entry in entries:
+                    last_seq = entry["seq"]
+                    yield _event(entry)
+                if len(entries) < CHANGE_BATCH_SIZE:
+                    break
+        while True:
+            try:
+                entry = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if entry is None:
+                return
+            if last_seq is not None and entry["seq"] <= last_seq:
+                continue
+            last_seq = entry["seq"]
+            yield _event(entry)
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,57 @@
+import enum
+from typing import Dict, Iterable, List, Mapping
+
+from models import ChangeLogEntry
+from schemas import ChangeOp
+from sqlalchemy import delete, insert, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from versions import bump_versions
+
+CHANGE_LOG = "change_log"
+
+def model_row(obj) -> Dict:
+    """Column values of an ORM object, the shape log_changes expects"""
+    return {column.key: getattr(obj, column.key) for column in inspect(obj).mapper.column_attrs}
+
+def _entries(table: str, op: ChangeOp, rows: Iterable[Mapping]) -> List[Dict]:
+    entries = []
+    for row in rows:
+        data = None
+        if op != ChangeOp.DELETE:
+            data = {key: value.value if isinstance(value, enum.Enum) else value for key, value in row.items()}
+        entries.append({"table_name": table, "op": op.value, "row_id": row["id"], "data": data})
+    return entries
+
+def _delete_cascaded(model, condition):
+    return delete(model).where(condition).returning(model.id).execution_options(synchronize_session=False)
+
+def log_changes(db: Session, table: str, op: ChangeOp, rows: Iterable[Mapping]):
+    """Append writes to the change log; call it last before commit, after the write's own bump_versions
+
+    Bumping the change_log version first holds that row's lock until commit, so sequence numbers are handed
+    out in commit order and a reader paging by seq never skips a change that commits late.
+    """
+    entries = _entries(table, op, rows)
+    if entries:
+        db.execute(bump_versions(CHANGE_LOG))
+        db.execute(insert(ChangeLogEntry), entries)
+
+def delete_cascaded(db: Session, model, condition) -> List[Dict]:
+    """Delete the rows an ON DELETE CASCADE is about to remove, with one DELETE ... RETURNING, for log_changes
+
+    Call it after locking their parents and before deleting those, so no row can be added in between; the
+    cascade then finds nothing left, and the rows are logged at the end of the write with the rest.
+    """
+    return [{"id": row_id} for row_id in sorted(db.scalars(_delete_cascaded(model, condition)))]
+
+async def async_log_changes(db: AsyncSession, table: str, op: ChangeOp, rows: Iterable[Mapping]):
+    """Async counterpart of log_changes"""
+    entries = _entries(table, op, rows)
+    if entries:
+        await db.execute(bump_versions(CHANGE_LOG))
+        await db.execute(insert(ChangeLogEntry), entries)
+
+async def async_delete_cascaded(db: AsyncSession, model, condition) -> List[Dict]:
+    """Async counterpart of delete_cascaded"""
+    return [{"id": row_id} for row_id in sorted(await db.scalars(_delete_cascaded(model, condition)))]
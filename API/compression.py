@@ -0,0 +1,184 @@
+import os
+import zlib
+from typing import Optional
+
+import anyio.lowlevel
+import anyio.to_thread
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Responses smaller than this go out uncompressed; framing overhead outweighs the savings
+COMPRESSION_MIN_BYTES = int(os.getenv("API_COMPRESSION_MIN_BYTES", "1000"))
+GZIP_LEVEL = int(os.getenv("API_GZIP_LEVEL", "6"))
+# Brotli quality for dynamic responses; 11 compresses harder but is far too slow per request
+BROTLI_QUALITY = int(os.getenv("API_BROTLI_QUALITY", "4"))
+# Chunks this large are compressed in a worker thread rather than on the event loop
+THREAD_MIN_BYTES = 128 * 1024
+
+# Event streams must reach the client as each event is sent; archives and images are compressed already
+EXCLUDED_MEDIA_TYPES = frozenset({
+    "text/event-stream",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zip",
+    "image/*",
+    "audio/*",
+    "video/*",
+})
+
+_compression_capacity_limiter = anyio.lowlevel.RunVar("_compression_capacity_limiter")
+
+def _compression_limiter() -> anyio.CapacityLimiter:
+    """Threads for compressing large chunks, kept apart from the pool sync route handlers run in"""
+    try:
+        return _compression_capacity_limiter.get()
+    except LookupError:
+        limiter = anyio.CapacityLimiter(40)
+        _compression_capacity_limiter.set(limiter)
+        return limiter
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codings named in an Accept-Encoding header, leaving out any refused with q=0"""
+    encodings = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        try:
+            weight = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            weight = 1.0
+        if weight > 0:
+            encodings.add(coding.strip().lower())
+    return encodings
+
+class GzipEncoder:
+    """One gzip stream; each chunk is flushed so a streamed response reaches the client as it is sent"""
+
+    content_encoding = "gzip"
+
+    def __init__(self, level: int = GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        if more_body:
+            return self._compressor.compress(body) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return self._compressor.compress(body) + self._compressor.flush()
+
+class BrotliEncoder:
+    """Brotli counterpart of GzipEncoder"""
+
+    content_encoding = "br"
+
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+def _is_excluded(media_type: str) -> bool:
+    media_type = media_type.partition(";")[0].strip().lower()
+    return media_type in EXCLUDED_MEDIA_TYPES or media_type.partition("/")[0] + "/*" in EXCLUDED_MEDIA_TYPES
+
+class CompressionMiddleware:
+    """Compress responses with brotli when the client accepts it, else gzip
+
+    Responses under minimum_size bytes, already-encoded or partial ones and excluded media types
+    go out untouched. Chunks of thread_minimum_size bytes or more are compressed in a worker thread.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_BYTES,
+        compresslevel: int = GZIP_LEVEL,
+        thread_minimum_size: int = THREAD_MIN_BYTES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.thread_minimum_size = thread_minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+        if "br" in encodings:
+            encoder = BrotliEncoder()
+        elif "gzip" in encodings:
+            encoder = GzipEncoder(self.compresslevel)
+        else:
+            encoder = None
+        responder = _CompressionResponder(send, encoder, self.minimum_size, self.thread_minimum_size)
+        await self.app(scope, receive, responder.send)
+
+class _CompressionResponder:
+    """Holds back the response start until the first body chunk shows whether to compress"""
+
+    def __init__(self, send: Send, encoder, minimum_size: int, thread_minimum_size: int):
+        self._send = send
+        self._encoder = encoder
+        self._minimum_size = minimum_size
+        self._thread_minimum_size = thread_minimum_size
+        self._start: Optional[Message] = None
+        self._passthrough = False
+        self._started = False
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self._passthrough = (
+                "content-encoding" in headers
+                or message["status"] == 206
+                or _is_excluded(headers.get("content-type", ""))
+            )
+            if self._passthrough:
+                await self._send(message)
+            else:
+                self._start = message
+        elif message_type != "http.response.body" or self._passthrough:
+            if self._start is not None:
+                await self._send(self._start)
+                self._start = None
+            await self._send(message)
+        elif not self._started:
+            self._started = True
+            await self._send_first_body(message)
+        else:
+            message["body"] = await self._compress(message.get("body", b""), message.get("more_body", False))
+            await self._send(message)
+
+    async def _send_first_body(self, message: Message) -> None:
+        start, self._start = self._start, None
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if len(body) < self._minimum_size and not more_body:
+            await self._send(start)
+            await self._send(message)
+            return
+
+        headers = MutableHeaders(raw=start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if self._encoder is not None:
+            headers["Content-Encoding"] = self._encoder.content_encoding
+            message["body"] = await self._compress(body, more_body)
+            if more_body or start.get("trailers", False):
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(message["body"]))
+        await self._send(start)
+        await self._send(message)
+
+    async def _compress(self, body: bytes, more_body: bool) -> bytes:
+        if self._encoder is None:
+            return body
+        if len(body) >= self._thread_minimum_size:
+            return await anyio.to_thread.run_sync(
+                self._encoder.compress, body, more_body, limiter=_compression_limiter()
+            )
+        return self._encoder.compress(body, more_body)
@@ -1,6 +1,8 @@
 import os
 
+from pool_metrics import MeteredAsyncAdaptedQueuePool, MeteredQueuePool
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 DB_USER = os.getenv("POSTGRES_USER", "itadmin")
@@ -9,14 +11,62 @@ DB_HOST = os.getenv("POSTGRES_HOST", "db")
 DB_PORT = os.getenv("POSTGRES_PORT", "5432")
 DB_NAME = os.getenv("POSTGRES_DB", "demo_db")
 
+# Connection pool sizing, shared by the sync and async engines
+DB_POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("POSTGRES_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("POSTGRES_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("POSTGRES_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Connections each worker opens at startup, so the first requests after a deploy don't pay for them
+DB_POOL_WARMUP = int(os.getenv("POSTGRES_POOL_WARMUP", "0"))
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+# "sync" serves routes from the threadpool, "async" awaits the database on the event loop
+DB_MODE = os.getenv("API_DB_MODE", "sync")
+
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, poolclass=MeteredQueuePool, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=MeteredAsyncAdaptedQueuePool, **POOL_OPTIONS)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def warm_up_pool(connections: int = DB_POOL_WARMUP):
+    """Open up to connections pooled connections at once and check them back in idle"""
+    held = []
+    try:
+        for _ in range(min(connections, DB_POOL_SIZE)):
+            held.append(engine.connect())
+    finally:
+        for connection in held:
+            connection.close()
+
+async def async_warm_up_pool(connections: int = DB_POOL_WARMUP):
+    """Async counterpart of warm_up_pool"""
+    held = []
+    try:
+        for _ in range(min(connections, DB_POOL_SIZE)):
+            held.append(await async_engine.connect())
+    finally:
+        for connection in held:
+            await connection.close()
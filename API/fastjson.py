@@ -0,0 +1,27 @@
+from typing import Any, Mapping, Optional
+
+import orjson
+from fastapi import Response
+
+class FastJSONResponse(Response):
+    """JSON response rendered by orjson, which serializes enums and datetimes natively"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+def schema_columns(schema, model):
+    """The model columns backing each field of a flat read schema, in field order"""
+    return tuple(getattr(model, name) for name in schema.model_fields)
+
+def rows_response(rows, headers: Optional[Mapping[str, str]] = None) -> FastJSONResponse:
+    """Serialize Core rows straight to JSON, skipping ORM hydration and response_model validation
+
+    The route keeps its response_model so the OpenAPI schema is unchanged; the rows must already match it.
+    """
+    return FastJSONResponse([row._asdict() for row in rows], headers=headers)
+
+def page_response(page: dict, headers: Optional[Mapping[str, str]] = None) -> FastJSONResponse:
+    """rows_response for a keyset page built by pagination.keyset_page"""
+    items = [row._asdict() for row in page["items"]]
+    return FastJSONResponse({"items": items, "next_cursor": page["next_cursor"]}, headers=headers)
@@ -0,0 +1,42 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Query
+from pydantic import TypeAdapter
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+FIELDS_QUERY = Query(None, description="Comma-separated fields to return, e.g. id,name; id is always included")
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[Tuple[str, ...]]:
+    """Parse fields=name,email into field names in schema order, with id added; None asks for every field"""
+    if fields is None:
+        return None
+    allowed = tuple(allowed)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(sorted(unknown))}")
+    requested.add("id")
+    return tuple(name for name in allowed if name in requested)
+
+def pick_columns(columns, requested: Optional[Tuple[str, ...]]):
+    """The subset of a flat column list that was asked for, so the SELECT itself narrows"""
+    if requested is None:
+        return columns
+    return tuple(column for column in columns if column.key in requested)
+
+def load_only_requested(model, requested: Tuple[str, ...]):
+    """load_only() option for the requested fields that are columns of model (relationships are loaded separately)"""
+    column_keys = inspect(model).columns.keys()
+    return load_only(*(getattr(model, name) for name in requested if name in column_keys))
+
+def sparse_item(obj, requested: Tuple[str, ...], nested: Dict[str, TypeAdapter]) -> dict:
+    """Plain dict of the requested fields of obj, serializing relationship fields through their adapters"""
+    item = {}
+    for name in requested:
+        value = getattr(obj, name)
+        if name in nested:
+            adapter = nested[name]
+            value = adapter.dump_python(adapter.validate_python(value, from_attributes=True), mode="json")
+        item[name] = value
+    return item
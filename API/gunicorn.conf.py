@@ -0,0 +1,35 @@
+"""Production server profile: gunicorn supervising uvicorn workers
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Every setting can be overridden from the environment; docker-compose.yml runs the API this way.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('API_PORT', '8000')}"
+workers = int(os.getenv("API_WORKERS", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Import the app once in the master; forked workers share its modules copy-on-write and start faster
+preload_app = True
+
+# On SIGTERM a worker stops accepting connections and finishes in-flight requests for up to this many
+# seconds before it is killed. Open /changes/stream clients are cut at the deadline and resume elsewhere
+# with Last-Event-ID.
+graceful_timeout = int(os.getenv("API_GRACEFUL_TIMEOUT", "30"))
+# A worker that stops answering the master for this long is restarted
+timeout = int(os.getenv("API_WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("API_KEEPALIVE_SECONDS", "5"))
+
+accesslog = "-"
+
+# Each worker fills its pool on startup (see main.lifespan) unless told otherwise; set before the preload
+os.environ.setdefault("POSTGRES_POOL_WARMUP", os.getenv("POSTGRES_POOL_SIZE", "5"))
+
+def post_fork(server, worker):
+    # The engines were built in the master by preload_app; a worker must never reuse a connection it inherited
+    from db import async_engine, engine
+
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
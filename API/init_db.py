@@ -1,7 +1,8 @@
 import os
 
+from migrate import migrate
 from models import Base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 
 DB_USER = os.getenv("POSTGRES_USER", "itadmin")
 DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "password1234")
@@ -12,9 +13,13 @@ DB_NAME = os.getenv("POSTGRES_DB", "demo_db")
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 def reset_database():
+    """Drop everything and rebuild the schema through the migrations; destroys all data"""
     engine = create_engine(DATABASE_URL)
     Base.metadata.drop_all(engine)
-    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    engine.dispose()
+    migrate(DATABASE_URL)
     print("Database schema reset and initialized.")
 
 if __name__ == "__main__":
@@ -0,0 +1,39 @@
+from fastapi import HTTPException
+from models import CloudResource, Developer
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.exc import IntegrityError
+
+UNIQUE_VIOLATION = "23505"
+
+def is_unique_violation(exc: IntegrityError) -> bool:
+    """Tell a unique violation from a foreign key one, by SQLSTATE on Postgres and by message on SQLite"""
+    pgcode = getattr(exc.orig, "pgcode", None)
+    if pgcode is not None:
+        return pgcode == UNIQUE_VIOLATION
+    return str(exc.orig).startswith("UNIQUE constraint failed")
+
+def parent_ids_query(developer_ids, resource_ids):
+    """Select which of the given developer and resource ids exist, in a single query"""
+    return union_all(
+        select(literal("developer"), Developer.id).where(Developer.id.in_(developer_ids)),
+        select(literal("resource"), CloudResource.id).where(CloudResource.id.in_(resource_ids)),
+    )
+
+def split_parent_ids(rows):
+    """Split the rows of parent_ids_query into (developer_ids, resource_ids)"""
+    found = {"developer": set(), "resource": set()}
+    for kind, parent_id in rows:
+        found[kind].add(parent_id)
+    return found["developer"], found["resource"]
+
+def duplicate_permission_error(permission) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Permission already exists for developer {permission.developer_id} and resource {permission.resource_id}"
+    )
+
+def missing_parent_error(permission, developer_ids) -> HTTPException:
+    """The 404 for a permission whose developer or resource does not exist"""
+    if permission.developer_id not in developer_ids:
+        return HTTPException(status_code=404, detail="Developer not found")
+    return HTTPException(status_code=404, detail="CloudResource not found")
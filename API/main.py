@@ -1,17 +1,99 @@
-from fastapi import FastAPI
+import asyncio
+import inspect
+from contextlib import asynccontextmanager, suppress
 
-app = FastAPI()
+from cache import follow_changes, response_cache
+from change_stream import change_broadcaster
+from compression import COMPRESSION_MIN_BYTES, GZIP_LEVEL, CompressionMiddleware
+from db import DB_MODE, DB_POOL_WARMUP, async_warm_up_pool, engine, warm_up_pool
+from fastapi import APIRouter, FastAPI
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Fill the pool of the engine this mode serves from before the worker takes requests
+
+    With the response cache on, the worker also tails the change log for the rest of its life, so other
+    workers' writes invalidate its cache.
+    """
+    if DB_POOL_WARMUP:
+        try:
+            if DB_MODE == "async":
+                await async_warm_up_pool()
+            else:
+                await run_in_threadpool(warm_up_pool)
+        except (SQLAlchemyError, OSError):
+            # Start anyway; /health/ready keeps the worker out of rotation until the database answers
+            pass
+    follower = None
+    if response_cache.enabled:
+        follower = asyncio.create_task(follow_changes(response_cache, change_broadcaster, engine))
+    yield
+    if follower is not None:
+        follower.cancel()
+        with suppress(asyncio.CancelledError):
+            await follower
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES, compresslevel=GZIP_LEVEL)
 
 @app.get("/", tags=["root"])
 def read_root():
     return {"message": "API server is running."}
 
+def with_async_routes(sync_router: APIRouter, async_router: APIRouter) -> APIRouter:
+    """Swap in the async handler for every route, keeping the sync router's order.
+
+    A sync handler left behind would run on the threadpool against the sync engine, so a router wrapped
+    here must have an async version of each one; coroutine handlers that never query the database may stay.
+    """
+    async_routes = {(route.path, frozenset(route.methods)): route for route in async_router.routes}
+    missing = [
+        f"{' '.join(sorted(route.methods))} {route.path}"
+        for route in sync_router.routes
+        if (route.path, frozenset(route.methods)) not in async_routes
+        and not inspect.iscoroutinefunction(route.endpoint)
+    ]
+    if missing:
+        raise RuntimeError(f"No async version of {', '.join(missing)} for API_DB_MODE=async")
+    router = APIRouter()
+    router.routes.extend(
+        async_routes.get((route.path, frozenset(route.methods)), route) for route in sync_router.routes
+    )
+    return router
+
 # Import and include developer router
 
+from routes.access_matrix.routes import router as access_matrix_router
+from routes.audit.routes import router as audit_router
+from routes.changes.routes import router as changes_router
 from routes.cloud_resource.routes import router as cloud_resource_router
 from routes.developer.routes import router as developer_router
+from routes.export.routes import router as export_router
+from routes.health.routes import router as health_router
+from routes.internal.routes import router as internal_router
 from routes.permission.routes import router as permission_router
+from routes.stats.routes import router as stats_router
+
+if DB_MODE == "async":
+    from routes.cloud_resource.async_routes import router as async_cloud_resource_router
+    from routes.developer.async_routes import router as async_developer_router
+    from routes.health.async_routes import router as async_health_router
+    from routes.permission.async_routes import router as async_permission_router
+
+    developer_router = with_async_routes(developer_router, async_developer_router)
+    cloud_resource_router = with_async_routes(cloud_resource_router, async_cloud_resource_router)
+    permission_router = with_async_routes(permission_router, async_permission_router)
+    health_router = with_async_routes(health_router, async_health_router)
 
 app.include_router(developer_router)
 app.include_router(cloud_resource_router)
 app.include_router(permission_router)
+app.include_router(export_router)
+app.include_router(stats_router)
+app.include_router(audit_router)
+app.include_router(access_matrix_router)
+app.include_router(changes_router)
+app.include_router(internal_router)
+app.include_router(health_router)
@@ -0,0 +1,100 @@
+import io
+import os
+import sys
+import zipfile
+from array import array
+from typing import Dict, Optional
+
+from models import CloudResource, CloudTypeEnum, Permission, PermissionEnum
+from sqlalchemy import case, literal, select, union_all
+from sqlalchemy.orm import Session
+
+# uint8 cell codes; RW is READ | WRITE so consumers can test bits
+CELL_CODES = {PermissionEnum.READ: 1, PermissionEnum.WRITE: 2, PermissionEnum.RW: 3}
+# Rows fetched per round trip from the server-side cursor the matrix is built from
+MATRIX_BATCH_SIZE = 10000
+# Largest developers x resources product served as a dense matrix; anything bigger must use layout=csr
+MAX_DENSE_CELLS = int(os.getenv("API_ACCESS_MATRIX_MAX_DENSE_CELLS", "10000000"))
+
+# The array typecode holding 4-byte ints on this platform, written out as <i4
+_INT32 = next((code for code in "il" if array(code).itemsize == 4), None)
+if _INT32 is None:
+    raise ImportError("matrix needs a 4-byte array typecode ('i' or 'l')")
+
+def _int32s(values=()) -> array:
+    return array(_INT32, values)
+
+def access_matrix(db: Session, cloud_type: Optional[CloudTypeEnum] = None) -> Dict:
+    """CSR developer x resource matrix of cell codes, built from one ordered scan of permissions
+
+    Rows are the developers and columns the resources that hold at least one grant, both in id order.
+    The distinct resource ids lead the same statement as the grants, so both read one snapshot, and the
+    rows stream from a server-side cursor into the arrays without ever being held all at once.
+    """
+    def filtered(query):
+        if cloud_type is None:
+            return query
+        return query.join(CloudResource, Permission.resource_id == CloudResource.id).where(
+            CloudResource.cloud_type == cloud_type
+        )
+
+    code = case(*((Permission.permission == level, code) for level, code in CELL_CODES.items()))
+    columns = filtered(
+        select(
+            literal(0).label("part"),
+            literal(0).label("developer_id"),
+            Permission.resource_id.label("resource_id"),
+            literal(0).label("cell"),
+        ).distinct()
+    )
+    grants = filtered(select(literal(1), Permission.developer_id, Permission.resource_id, code))
+    rows = union_all(columns, grants).subquery()
+    query = select(rows).order_by(rows.c.part, rows.c.developer_id, rows.c.resource_id)
+    # Core rows straight off the connection; this is the hot loop for matrices with millions of grants
+    result = db.connection().execute(query.execution_options(yield_per=MATRIX_BATCH_SIZE))
+
+    column_ids, column_index = _int32s(), {}
+    row_ids, indptr, indices, data = _int32s(), _int32s(), _int32s(), array("B")
+    last_developer_id = None
+    for part, developer_id, resource_id, cell in result:
+        if not part:
+            column_index[resource_id] = len(column_ids)
+            column_ids.append(resource_id)
+            continue
+        if developer_id != last_developer_id:
+            last_developer_id = developer_id
+            row_ids.append(developer_id)
+            indptr.append(len(indices))
+        indices.append(column_index[resource_id])
+        data.append(cell)
+    indptr.append(len(indices))
+    return {"row_ids": row_ids, "column_ids": column_ids, "indptr": indptr, "indices": indices, "data": data}
+
+def dense_cells(matrix: Dict) -> bytearray:
+    """Row-major uint8 cells of a CSR matrix from access_matrix, 0 where there is no grant"""
+    width = len(matrix["column_ids"])
+    cells = bytearray(len(matrix["row_ids"]) * width)
+    indptr, indices, data = matrix["indptr"], matrix["indices"], matrix["data"]
+    for row in range(len(indptr) - 1):
+        offset = row * width
+        for position in range(indptr[row], indptr[row + 1]):
+            cells[offset + indices[position]] = data[position]
+    return cells
+
+def _npy(values, descr: str, shape: tuple) -> bytes:
+    """A version 1.0 .npy file holding values, readable by numpy.load without numpy on the server"""
+    if isinstance(values, array) and values.itemsize > 1 and sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': {shape!r}, }}"
+    # Magic, version and length take 10 bytes; the header pads with spaces to a 64-byte boundary
+    header += " " * (-(10 + len(header) + 1) % 64) + "\n"
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin1") + bytes(values)
+
+def npz_archive(arrays: Dict[str, tuple]) -> bytes:
+    """An uncompressed .npz of name -> (values, descr, shape); the response middleware compresses it"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, (values, descr, shape) in arrays.items():
+            archive.writestr(f"{name}.npy", _npy(values, descr, shape))
+    return buffer.getvalue()
@@ -0,0 +1,41 @@
+import os
+import sys
+from logging.config import fileConfig
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alembic import context
+from models import Base
+from sqlalchemy import create_engine
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def database_url() -> str:
+    """An explicit sqlalchemy.url (as the tests set) wins over the POSTGRES_* environment"""
+    url = config.get_main_option("sqlalchemy.url")
+    if url:
+        return url
+    from db import DATABASE_URL
+    return DATABASE_URL
+
+def run_migrations_offline():
+    context.configure(url=database_url(), target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    engine = create_engine(database_url())
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,52 @@
+"""Initial schema: developers, cloud resources and the permissions between them
+
+Databases created by the old init_db.py create_all are stamped at this revision by migrate.py.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "developers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False, unique=True),
+    )
+    op.create_index("ix_developers_id", "developers", ["id"])
+
+    op.create_table(
+        "cloud_resources",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cloud_type", sa.Enum("AWS", "AZURE", "GCP", name="cloudtypeenum"), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+    )
+    op.create_index("ix_cloud_resources_id", "cloud_resources", ["id"])
+
+    op.create_table(
+        "permissions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("resource_id", sa.Integer(), sa.ForeignKey("cloud_resources.id"), nullable=False),
+        sa.Column("developer_id", sa.Integer(), sa.ForeignKey("developers.id"), nullable=False),
+        sa.Column("permission", sa.Enum("READ", "WRITE", "RW", name="permissionenum"), nullable=False),
+        sa.UniqueConstraint("developer_id", "resource_id", name="_developer_resource_uc"),
+    )
+    op.create_index("ix_permissions_id", "permissions", ["id"])
+
+
+def downgrade():
+    op.drop_table("permissions")
+    op.drop_table("cloud_resources")
+    op.drop_table("developers")
+    sa.Enum(name="permissionenum").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="cloudtypeenum").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,79 @@
+"""Table versions for ETags, list filter indexes and trigram name search
+
+Objects may already exist on databases that create_all built from newer models, so each step checks first.
+On Postgres the indexes are built CONCURRENTLY, outside a transaction, so a live database keeps taking writes.
+A build that fails part way leaves an INVALID index behind; drop it before running the upgrade again.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ("developers", "cloud_resources", "permissions")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("table_versions"):
+        table_versions = op.create_table(
+            "table_versions",
+            sa.Column("table_name", sa.String(), primary_key=True),
+            sa.Column("version", sa.BigInteger(), nullable=False),
+        )
+        op.bulk_insert(table_versions, [{"table_name": name, "version": 0} for name in VERSIONED_TABLES])
+
+    if bind.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_cloud_resources_cloud_type_id",
+            "cloud_resources",
+            ["cloud_type", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_developers_name_lower",
+            "developers",
+            [sa.text("lower(name)")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        if bind.dialect.name == "postgresql":
+            op.create_index(
+                "ix_cloud_resources_name_trgm",
+                "cloud_resources",
+                ["name"],
+                postgresql_using="gin",
+                postgresql_ops={"name": "gin_trgm_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        if op.get_bind().dialect.name == "postgresql":
+            op.drop_index(
+                "ix_cloud_resources_name_trgm",
+                table_name="cloud_resources",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+        op.drop_index("ix_developers_name_lower", table_name="developers", postgresql_concurrently=True, if_exists=True)
+        op.drop_index(
+            "ix_cloud_resources_cloud_type_id",
+            table_name="cloud_resources",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_table("table_versions")
@@ -0,0 +1,33 @@
+"""Covering indexes for permission lookups by resource and by developer
+
+On Postgres they are built CONCURRENTLY, outside a transaction, so a live database keeps taking writes.
+A build that fails part way leaves an INVALID index behind; drop it before running the upgrade again.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_permissions_resource_id_permission", ["resource_id", "permission"]),
+    ("ix_permissions_developer_id_permission", ["developer_id", "permission"]),
+)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, "permissions", columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.drop_index(name, table_name="permissions", postgresql_concurrently=True, if_exists=True)
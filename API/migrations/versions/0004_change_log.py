@@ -0,0 +1,39 @@
+"""Append-only change log behind GET /changes
+
+The table may already exist on databases that create_all built from newer models, so each step checks first.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("change_log"):
+        op.create_table(
+            "change_log",
+            sa.Column("seq", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True, autoincrement=True),
+            sa.Column("table_name", sa.String(), nullable=False),
+            sa.Column("op", sa.String(), nullable=False),
+            sa.Column("row_id", sa.Integer(), nullable=False),
+            sa.Column("data", sa.JSON(), nullable=True),
+            sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+    # The version row doubles as the lock that keeps sequence numbers in commit order
+    seeded = bind.execute(sa.text("SELECT 1 FROM table_versions WHERE table_name = 'change_log'")).first()
+    if not seeded:
+        op.execute(sa.text("INSERT INTO table_versions (table_name, version) VALUES ('change_log', 0)"))
+
+
+def downgrade():
+    op.execute(sa.text("DELETE FROM table_versions WHERE table_name = 'change_log'"))
+    op.drop_table("change_log")
@@ -0,0 +1,58 @@
+"""ON DELETE CASCADE from developers and cloud resources to their permissions
+
+On Postgres the constraints are swapped in NOT VALID, which holds the table lock only briefly. They are
+validated after that transaction commits, outside a transaction, so the scan of existing rows runs under a lock
+that lets reads and writes continue. SQLite cannot alter constraints, so the table is rebuilt there.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+FOREIGN_KEYS = (("resource_id", "cloud_resources"), ("developer_id", "developers"))
+# Names for SQLite's unnamed constraints, which batch mode needs to drop them
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _set_ondelete(ondelete):
+    bind = op.get_bind()
+    names = {
+        foreign_key["constrained_columns"][0]: foreign_key["name"]
+        for foreign_key in sa.inspect(bind).get_foreign_keys("permissions")
+    }
+    if bind.dialect.name == "postgresql":
+        action = f" ON DELETE {ondelete}" if ondelete else ""
+        for column, referred in FOREIGN_KEYS:
+            name = names[column]
+            op.drop_constraint(name, "permissions", type_="foreignkey")
+            op.execute(
+                f"ALTER TABLE permissions ADD CONSTRAINT {name} FOREIGN KEY ({column}) "
+                f"REFERENCES {referred} (id){action} NOT VALID"
+            )
+        # Commits the swap, releasing its ACCESS EXCLUSIVE lock, before the validating scans
+        with op.get_context().autocommit_block():
+            for column, _ in FOREIGN_KEYS:
+                op.execute(f"ALTER TABLE permissions VALIDATE CONSTRAINT {names[column]}")
+        return
+
+    with op.batch_alter_table("permissions", naming_convention=NAMING_CONVENTION) as batch:
+        for column, referred in FOREIGN_KEYS:
+            name = names[column] or f"fk_permissions_{column}_{referred}"
+            batch.drop_constraint(name, type_="foreignkey")
+            batch.create_foreign_key(name, referred, [column], ["id"], ondelete=ondelete)
+
+
+def upgrade():
+    _set_ondelete("CASCADE")
+
+
+def downgrade():
+    _set_ondelete(None)
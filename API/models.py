@@ -1,11 +1,28 @@
 import enum
 
-from sqlalchemy import Column, Enum, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import (
+    DDL,
+    JSON,
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    event,
+    func
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# Trigram operators for fuzzy resource-name search on Postgres
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
 
 class CloudTypeEnum(enum.Enum):
     AWS = "AWS"
@@ -33,6 +50,16 @@ class Developer(Base):
 
 class CloudResource(Base):
     __tablename__ = "cloud_resources"
+    __table_args__ = (
+        Index("ix_cloud_resources_cloud_type_id", "cloud_type", "id"),
+        # Fuzzy name search; other databases use the in-process index in search.py
+        Index(
+            "ix_cloud_resources_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cloud_type = Column(Enum(CloudTypeEnum), nullable=False)
@@ -59,16 +86,54 @@ class Permission(Base):
     __tablename__ = "permissions"
     __table_args__ = (
         UniqueConstraint('developer_id', 'resource_id', name='_developer_resource_uc'),
+        # Cover the by-resource/by-developer lookups and their permission-level filters
+        Index("ix_permissions_resource_id_permission", "resource_id", "permission"),
+        Index("ix_permissions_developer_id_permission", "developer_id", "permission"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
-    resource_id = Column(Integer, ForeignKey("cloud_resources.id"), nullable=False)
-    developer_id = Column(Integer, ForeignKey("developers.id"), nullable=False)
+    # Deleting a developer or resource removes its grants in the database, without loading them first
+    resource_id = Column(Integer, ForeignKey("cloud_resources.id", ondelete="CASCADE"), nullable=False)
+    developer_id = Column(Integer, ForeignKey("developers.id", ondelete="CASCADE"), nullable=False)
     permission = Column(Enum(PermissionEnum), nullable=False)
 
     developer = relationship("Developer", back_populates="permissions")
     cloud_resource = relationship("CloudResource", back_populates="permissions")
 
 # Add the back_populates to complete the relationships
-Developer.permissions = relationship("Permission", back_populates="developer")
-CloudResource.permissions = relationship("Permission", back_populates="cloud_resource")
+Developer.permissions = relationship(
+    "Permission", back_populates="developer", cascade="all, delete", passive_deletes=True
+)
+CloudResource.permissions = relationship(
+    "Permission", back_populates="cloud_resource", cascade="all, delete", passive_deletes=True
+)
+
+# Case-insensitive name lookups on developers
+Index("ix_developers_name_lower", func.lower(Developer.name))
+
+class TableVersion(Base):
+    """Change counter per table, bumped by every write so readers can revalidate cheaply"""
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+VERSIONED_TABLES = ("developers", "cloud_resources", "permissions", "change_log")
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def _seed_table_versions(target, connection, **kw):
+    connection.execute(target.insert(), [{"table_name": name, "version": 0} for name in VERSIONED_TABLES])
+
+class ChangeLogEntry(Base):
+    """Append-only record of every write to developers, cloud_resources and permissions, in commit order
+
+    data holds the row as it reads after the change, and is null for deletes.
+    """
+    __tablename__ = "change_log"
+
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    table_name = Column(String, nullable=False)
+    op = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    data = Column(JSON, nullable=True)
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,56 @@
+import base64
+import binascii
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+# Largest page a list route serves, by offset or by cursor
+MAX_PAGE_SIZE = 1000
+LIMIT_QUERY = Query(100, ge=1, le=MAX_PAGE_SIZE, description=f"Rows per page, 1 to {MAX_PAGE_SIZE}")
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the last id of a page into an opaque cursor"""
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """Decode a cursor back into the last id seen; an empty cursor starts from the first row"""
+    if not cursor:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(payload)["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_id
+
+def keyset_query(query, id_column, cursor: str, limit: int):
+    """Restrict a query to the page after the cursor: WHERE id > :last_id ORDER BY id
+
+    One extra row is fetched so keyset_page can tell whether another page follows.
+    """
+    last_id = decode_cursor(cursor)
+    if last_id is not None:
+        query = query.filter(id_column > last_id)
+    return query.order_by(id_column).limit(limit + 1)
+
+def keyset_page(rows, limit: int) -> dict:
+    """Build a page from the rows fetched by keyset_query"""
+    items = list(rows[:limit])
+    next_cursor = encode_cursor(items[-1].id) if items and len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+def sort_order(sort: str, columns: dict, id_column):
+    """ORDER BY clauses for a sort key such as "name", or "-name" for descending, tie-broken by id"""
+    column = columns[sort.lstrip("-")]
+    if sort.startswith("-"):
+        column = column.desc()
+    return (column,) if column is id_column else (column, id_column)
+
+def check_cursor_sort(sort: str):
+    """Cursors carry only the last id, so keyset paging is limited to id order"""
+    if sort != "id":
+        raise HTTPException(status_code=400, detail="Cursor paging only supports sort=id")
@@ -0,0 +1,82 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds, in milliseconds, of the checkout-time buckets
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class CheckoutHistogram:
+    """Thread-safe histogram of how long checkouts took to hand back a pooled connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+        self._count = 0
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._timeouts = 0
+
+    def observe(self, checkout_ms: float, timed_out: bool = False):
+        with self._lock:
+            self._counts[bisect.bisect_left(CHECKOUT_BUCKETS_MS, checkout_ms)] += 1
+            self._count += 1
+            self._sum_ms += checkout_ms
+            self._max_ms = max(self._max_ms, checkout_ms)
+            if timed_out:
+                self._timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buckets = [{"le": le, "count": count} for le, count in zip(CHECKOUT_BUCKETS_MS, self._counts)]
+            buckets.append({"le": "+Inf", "count": self._counts[-1]})
+            return {
+                "count": self._count,
+                "sum_ms": round(self._sum_ms, 3),
+                "max_ms": round(self._max_ms, 3),
+                "timeouts": self._timeouts,
+                "buckets": buckets,
+            }
+
+class _MeteredPoolMixin:
+    """Times every checkout: queueing for a free connection once the pool is exhausted, and opening a new
+    one when there is room, so a high tail means either the pool is too small or connects are slow
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_histogram = CheckoutHistogram()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.checkout_histogram.observe((time.perf_counter() - start) * 1000, timed_out)
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    pass
+
+class MeteredAsyncAdaptedQueuePool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def pool_status(pool, max_overflow: int) -> dict:
+    """Report current pool occupancy alongside its checkout-time histogram
+
+    max_overflow is the value the engine was configured with; the pool has no public accessor for it.
+    """
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # overflow() counts down from -pool_size until the pool is full
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": max_overflow,
+        "checkout_time_ms": pool.checkout_histogram.snapshot(),
+    }
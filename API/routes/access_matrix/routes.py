@@ -0,0 +1,89 @@
+from typing import Optional
+
+from db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastjson import FastJSONResponse
+from matrix import CELL_CODES, MAX_DENSE_CELLS, access_matrix, dense_cells, npz_archive
+from models import CloudTypeEnum
+from schemas import AccessMatrix, AccessMatrixLayout
+from sqlalchemy.orm import Session
+from versions import etag_for
+
+router = APIRouter(prefix="/access-matrix", tags=["access-matrix"])
+
+def _shape(matrix) -> tuple:
+    return (len(matrix["row_ids"]), len(matrix["column_ids"]))
+
+def _check_dense_size(matrix):
+    rows, columns = _shape(matrix)
+    if rows * columns > MAX_DENSE_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Dense matrix would have {rows * columns} cells (limit {MAX_DENSE_CELLS}); use layout=csr",
+        )
+
+@router.get(
+    "",
+    response_model=AccessMatrix,
+    dependencies=[Depends(etag_for("permissions", "cloud_resources"))],
+)
+def get_access_matrix(
+    response: Response,
+    cloud_type: Optional[CloudTypeEnum] = None,
+    layout: AccessMatrixLayout = AccessMatrixLayout.CSR,
+    db: Session = Depends(get_db)
+):
+    """Get the developer x resource permission matrix, as CSR arrays or dense rows of cell codes"""
+    matrix = access_matrix(db, cloud_type)
+    body = {
+        "cloud_type": cloud_type.value if cloud_type else None,
+        "layout": layout.value,
+        "shape": list(_shape(matrix)),
+        "codes": {level.value: code for level, code in CELL_CODES.items()},
+        "row_ids": matrix["row_ids"].tolist(),
+        "column_ids": matrix["column_ids"].tolist(),
+    }
+    if layout == AccessMatrixLayout.DENSE:
+        _check_dense_size(matrix)
+        cells, width = dense_cells(matrix), len(matrix["column_ids"])
+        body["cells"] = []
+        # Without grants there are no columns, and no rows either
+        if width:
+            body["cells"] = [list(cells[offset:offset + width]) for offset in range(0, len(cells), width)]
+    else:
+        body.update(
+            indptr=matrix["indptr"].tolist(), indices=matrix["indices"].tolist(), data=matrix["data"].tolist()
+        )
+    return FastJSONResponse(body, headers=response.headers)
+
+@router.get(
+    ".npz",
+    response_class=Response,
+    dependencies=[Depends(etag_for("permissions", "cloud_resources"))],
+)
+def get_access_matrix_npz(
+    response: Response,
+    cloud_type: Optional[CloudTypeEnum] = None,
+    layout: AccessMatrixLayout = AccessMatrixLayout.CSR,
+    db: Session = Depends(get_db)
+):
+    """The same matrix as a NumPy .npz archive: row_ids, column_ids and cells or indptr/indices/data
+
+    Load it with numpy.load(); the CSR arrays plug straight into scipy.sparse.csr_array.
+    """
+    matrix = access_matrix(db, cloud_type)
+    shape = _shape(matrix)
+    arrays = {
+        "row_ids": (matrix["row_ids"], "<i4", (shape[0],)),
+        "column_ids": (matrix["column_ids"], "<i4", (shape[1],)),
+    }
+    if layout == AccessMatrixLayout.DENSE:
+        _check_dense_size(matrix)
+        arrays["cells"] = (dense_cells(matrix), "|u1", shape)
+    else:
+        arrays["indptr"] = (matrix["indptr"], "<i4", (len(matrix["indptr"]),))
+        arrays["indices"] = (matrix["indices"], "<i4", (len(matrix["indices"]),))
+        arrays["data"] = (matrix["data"], "|u1", (len(matrix["data"]),))
+    headers = dict(response.headers)
+    headers["Content-Disposition"] = 'attachment; filename="access-matrix.npz"'
+    return Response(npz_archive(arrays), media_type="application/octet-stream", headers=headers)
@@ -0,0 +1,44 @@
+from itertools import groupby
+from typing import Optional
+
+from db import get_db
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from models import CloudResource, CloudTypeEnum, Permission, PermissionEnum
+from schemas import WriteAccessAudit
+from sqlalchemy.orm import Session
+from streaming import permission_graph_item, permission_graph_query, stream_ndjson
+from versions import etag_for
+
+router = APIRouter(prefix="/audit", tags=["audit"])
+
+def _write_access_query(cloud_type: Optional[CloudTypeEnum]):
+    """Every WRITE/RW grant joined to its developer and resource, ordered into cloud x level groups"""
+    query = (
+        permission_graph_query()
+        .where(Permission.permission.in_((PermissionEnum.WRITE, PermissionEnum.RW)))
+        .order_by(CloudResource.cloud_type, Permission.permission, Permission.id)
+    )
+    if cloud_type is not None:
+        query = query.where(CloudResource.cloud_type == cloud_type)
+    return query
+
+@router.get(
+    "/write-access",
+    response_model=WriteAccessAudit,
+    dependencies=[Depends(etag_for("developers", "cloud_resources", "permissions"))],
+)
+def audit_write_access(cloud_type: Optional[CloudTypeEnum] = None, db: Session = Depends(get_db)):
+    """Get every WRITE/RW grant with developer and resource details, grouped by cloud and level"""
+    rows = db.execute(_write_access_query(cloud_type)).all()
+    groups = []
+    for (group_cloud_type, permission), group in groupby(rows, key=lambda row: (row.cloud_type, row.permission)):
+        grants = [permission_graph_item(row) for row in group]
+        groups.append({"cloud_type": group_cloud_type, "permission": permission, "grants": grants})
+    return {"cloud_type": cloud_type, "total": len(rows), "groups": groups}
+
+@router.get("/write-access.ndjson", response_class=StreamingResponse)
+def stream_write_access(cloud_type: Optional[CloudTypeEnum] = None, db: Session = Depends(get_db)):
+    """Stream the same grants one per line, in cloud and level order, for result sets too large to buffer"""
+    query = _write_access_query(cloud_type)
+    return StreamingResponse(stream_ndjson(db.get_bind(), query), media_type="application/x-ndjson")
@@ -0,0 +1,55 @@
+from typing import Optional
+
+from change_stream import change_broadcaster, change_events
+from db import get_db
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from fastjson import FastJSONResponse, schema_columns
+from models import ChangeLogEntry
+from pagination import LIMIT_QUERY
+from schemas import ChangeLogEntryRead, ChangePage
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from versions import etag_for
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+_LIST_COLUMNS = schema_columns(ChangeLogEntryRead, ChangeLogEntry)
+
+@router.get(
+    "",
+    response_model=ChangePage,
+    dependencies=[Depends(etag_for("change_log"))],
+)
+def list_changes(response: Response, since: int = 0, limit: int = LIMIT_QUERY, db: Session = Depends(get_db)):
+    """Get the writes committed after sequence number since, oldest first
+
+    Start from since=0 and pass each page's next_since back to sync incrementally.
+    """
+    query = select(*_LIST_COLUMNS).where(ChangeLogEntry.seq > since).order_by(ChangeLogEntry.seq).limit(limit)
+    items = [row._asdict() for row in db.execute(query)]
+    next_since = items[-1]["seq"] if items else since
+    return FastJSONResponse({"items": items, "next_since": next_since}, headers=response.headers)
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_changes(
+    since: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Server-sent events for writes as they commit; each event's id is its sequence number
+
+    A reconnecting client's Last-Event-ID resumes right after the last event it saw; since= does the same
+    for a first connection, and without either the stream starts from now. A client that falls too far
+    behind is disconnected and resumes the same way.
+    """
+    if last_event_id is not None:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a change sequence number")
+    return StreamingResponse(
+        change_events(change_broadcaster, db.get_bind(), since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
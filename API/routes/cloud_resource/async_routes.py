@@ -0,0 +1,201 @@
+from typing import List, Optional, Union
+
+from batch import batch_result, ids_filter, parse_ids
+from bulk import async_insert_returning_ids, chunked
+from cache import response_cache
+from changes import async_delete_cascaded, async_log_changes, model_row
+from db import get_async_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastjson import FastJSONResponse, page_response, rows_response, schema_columns
+from fieldsets import FIELDS_QUERY, load_only_requested, parse_fields, pick_columns, sparse_item
+from models import CloudResource, CloudTypeEnum, Permission
+from pagination import LIMIT_QUERY, check_cursor_sort, keyset_page, keyset_query, sort_order
+from pydantic import TypeAdapter
+from schemas import (
+    BatchIds,
+    BulkCreateResult,
+    ChangeOp,
+    CloudResourceBatch,
+    CloudResourceCreate,
+    CloudResourceMatch,
+    CloudResourcePage,
+    CloudResourceRead,
+    CloudResourceSort,
+    CloudResourceWithDevelopers,
+    PermissionWithDeveloper
+)
+from search import MAX_SEARCH_RESULTS, async_search_resources
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from versions import async_etag_for, async_table_etag, bump_versions, check_etag
+
+router = APIRouter(prefix="/cloud_resources", tags=["cloud_resources"])
+
+_SORT_COLUMNS = {"id": CloudResource.id, "name": CloudResource.name, "cloud_type": CloudResource.cloud_type}
+_LIST_COLUMNS = schema_columns(CloudResourceRead, CloudResource)
+_DETAILED_NESTED = {"permissions": TypeAdapter(List[PermissionWithDeveloper])}
+
+@router.post("/", response_model=CloudResourceRead)
+async def create_cloud_resource(resource: CloudResourceCreate, db: AsyncSession = Depends(get_async_db)):
+    db_resource = CloudResource(**resource.dict())
+    db.add(db_resource)
+    await db.flush()
+    await db.execute(bump_versions("cloud_resources"))
+    await async_log_changes(db, "cloud_resources", ChangeOp.CREATE, [model_row(db_resource)])
+    await db.commit()
+    await db.refresh(db_resource)
+    return db_resource
+
+@router.post("/bulk", response_model=BulkCreateResult)
+async def bulk_create_cloud_resources(resources: List[CloudResourceCreate], db: AsyncSession = Depends(get_async_db)):
+    """Create many cloud resources in one transaction, with one INSERT per chunk"""
+    created_ids, created_rows = [], []
+    for chunk in chunked(resources):
+        rows = [resource.dict() for resource in chunk]
+        for row, new_id in zip(rows, await async_insert_returning_ids(db, CloudResource, rows)):
+            created_ids.append(new_id)
+            created_rows.append({"id": new_id, **row})
+    await db.execute(bump_versions("cloud_resources"))
+    await async_log_changes(db, "cloud_resources", ChangeOp.CREATE, created_rows)
+    await db.commit()
+    return {"created_ids": created_ids, "errors": []}
+
+@router.get(
+    "/",
+    response_model=Union[List[CloudResourceRead], CloudResourcePage],
+    dependencies=[Depends(async_etag_for("cloud_resources"))],
+)
+async def list_cloud_resources(
+    response: Response,
+    skip: int = 0,
+    limit: int = LIMIT_QUERY,
+    cloud_type: Optional[CloudTypeEnum] = None,
+    name_prefix: Optional[str] = None,
+    sort: CloudResourceSort = CloudResourceSort.ID,
+    fields: Optional[str] = FIELDS_QUERY,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List cloud resources by offset, or by keyset when a cursor is given (an empty cursor starts the first page)"""
+    requested = parse_fields(fields, CloudResourceRead.model_fields)
+    query = select(*pick_columns(_LIST_COLUMNS, requested))
+    if cloud_type is not None:
+        query = query.filter(CloudResource.cloud_type == cloud_type)
+    if name_prefix:
+        query = query.filter(CloudResource.name.startswith(name_prefix, autoescape=True))
+    if cursor is not None:
+        check_cursor_sort(sort)
+        result = await db.execute(keyset_query(query, CloudResource.id, cursor, limit))
+        return page_response(keyset_page(result.all(), limit), response.headers)
+    order = sort_order(sort, _SORT_COLUMNS, CloudResource.id)
+    result = await db.execute(query.order_by(*order).offset(skip).limit(limit))
+    return rows_response(result, response.headers)
+
+@router.get(
+    "/batch",
+    response_model=CloudResourceBatch,
+    dependencies=[Depends(async_etag_for("cloud_resources"))],
+)
+async def get_cloud_resources_batch(ids: str, db: AsyncSession = Depends(get_async_db)):
+    """Get cloud resources by ids=1,2,3 with one query, in request order, reporting ids that were not found"""
+    id_list = parse_ids(ids)
+    rows = await db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, CloudResource.id, id_list)))
+    return batch_result(rows, id_list)
+
+@router.post("/batch", response_model=CloudResourceBatch)
+async def post_cloud_resources_batch(batch: BatchIds, db: AsyncSession = Depends(get_async_db)):
+    """Body variant of GET /batch for id lists too long for a query string"""
+    rows = await db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, CloudResource.id, batch.ids)))
+    return batch_result(rows, batch.ids)
+
+@router.get(
+    "/search",
+    response_model=List[CloudResourceMatch],
+    dependencies=[Depends(async_etag_for("cloud_resources"))],
+)
+async def search_cloud_resources(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Fuzzy-match resource names against q, best match first
+
+    Uses the pg_trgm index on Postgres and an in-process trigram index elsewhere; both score like similarity().
+    """
+    return await async_search_resources(db, q, limit)
+
+@router.get(
+    "/{resource_id}",
+    response_model=CloudResourceRead,
+)
+async def get_cloud_resource(resource_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    key = ("GET /cloud_resources/{resource_id}", resource_id)
+    cached = response_cache.get(key, request)
+    if cached is not None:
+        return cached
+    generation = response_cache.generation()
+    check_etag(request, response, await async_table_etag(db, "cloud_resources"))
+    resource = await db.get(CloudResource, resource_id)
+    if not resource:
+        raise HTTPException(status_code=404, detail="CloudResource not found")
+    return response_cache.store(key, CloudResourceRead, resource, [("cloud_resource", resource_id)], generation, response.headers)
+
+@router.get(
+    "/{resource_id}/detailed",
+    response_model=CloudResourceWithDevelopers,
+    dependencies=[Depends(async_etag_for("developers", "cloud_resources", "permissions"))],
+)
+async def get_cloud_resource_with_developers(
+    resource_id: int,
+    response: Response,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get cloud resource with all developer permissions; leaving permissions out of fields skips loading them"""
+    requested = parse_fields(fields, CloudResourceWithDevelopers.model_fields)
+    query = select(CloudResource)
+    if requested is None or "permissions" in requested:
+        # Lazy loads cannot run during serialization on the event loop, so load eagerly
+        query = query.options(selectinload(CloudResource.permissions).joinedload(Permission.developer))
+    if requested is not None:
+        query = query.options(load_only_requested(CloudResource, requested))
+    result = await db.execute(query.filter(CloudResource.id == resource_id))
+    resource = result.scalars().first()
+    if not resource:
+        raise HTTPException(status_code=404, detail="CloudResource not found")
+    if requested is None:
+        return resource
+    return FastJSONResponse(sparse_item(resource, requested, _DETAILED_NESTED), headers=response.headers)
+
+@router.put("/{resource_id}", response_model=CloudResourceRead)
+async def update_cloud_resource(resource_id: int, resource: CloudResourceCreate, db: AsyncSession = Depends(get_async_db)):
+    db_resource = await db.get(CloudResource, resource_id)
+    if not db_resource:
+        raise HTTPException(status_code=404, detail="CloudResource not found")
+    for key, value in resource.dict().items():
+        setattr(db_resource, key, value)
+    await db.flush()
+    await db.execute(bump_versions("cloud_resources"))
+    await async_log_changes(db, "cloud_resources", ChangeOp.UPDATE, [model_row(db_resource)])
+    await db.commit()
+    await db.refresh(db_resource)
+    response_cache.invalidate(("cloud_resource", resource_id))
+    return db_resource
+
+@router.delete("/{resource_id}", response_model=dict)
+async def delete_cloud_resource(resource_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_resource = await db.get(CloudResource, resource_id, with_for_update=True)
+    if not db_resource:
+        raise HTTPException(status_code=404, detail="CloudResource not found")
+    cascaded = await async_delete_cascaded(db, Permission, Permission.resource_id == resource_id)
+    await db.delete(db_resource)
+    await db.flush()
+    await db.execute(bump_versions("cloud_resources"))
+    if cascaded:
+        await db.execute(bump_versions("permissions"))
+    await async_log_changes(db, "permissions", ChangeOp.DELETE, cascaded)
+    await async_log_changes(db, "cloud_resources", ChangeOp.DELETE, [{"id": resource_id}])
+    await db.commit()
+    response_cache.invalidate(("cloud_resource", resource_id))
+    return {"ok": True}
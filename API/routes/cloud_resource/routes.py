@@ -1,39 +1,169 @@
-from typing import List
+from typing import List, Optional, Union
 
+from batch import batch_result, ids_filter, parse_ids
+from bulk import chunked, insert_returning_ids
+from cache import response_cache
+from changes import delete_cascaded, log_changes, model_row
 from db import get_db
-from fastapi import APIRouter, Depends, HTTPException
-from models import CloudResource
-from schemas import CloudResourceCreate, CloudResourceRead, CloudResourceWithDevelopers
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastjson import FastJSONResponse, page_response, rows_response, schema_columns
+from fieldsets import FIELDS_QUERY, load_only_requested, parse_fields, pick_columns, sparse_item
+from models import CloudResource, CloudTypeEnum, Permission
+from pagination import LIMIT_QUERY, check_cursor_sort, keyset_page, keyset_query, sort_order
+from pydantic import TypeAdapter
+from schemas import (
+    BatchIds,
+    BulkCreateResult,
+    ChangeOp,
+    CloudResourceBatch,
+    CloudResourceCreate,
+    CloudResourceMatch,
+    CloudResourcePage,
+    CloudResourceRead,
+    CloudResourceSort,
+    CloudResourceWithDevelopers,
+    PermissionWithDeveloper
+)
+from search import MAX_SEARCH_RESULTS, search_resources
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from versions import bump_versions, check_etag, etag_for, table_etag
 
 router = APIRouter(prefix="/cloud_resources", tags=["cloud_resources"])
 
+_SORT_COLUMNS = {"id": CloudResource.id, "name": CloudResource.name, "cloud_type": CloudResource.cloud_type}
+_LIST_COLUMNS = schema_columns(CloudResourceRead, CloudResource)
+_DETAILED_NESTED = {"permissions": TypeAdapter(List[PermissionWithDeveloper])}
+
 @router.post("/", response_model=CloudResourceRead)
 def create_cloud_resource(resource: CloudResourceCreate, db: Session = Depends(get_db)):
     db_resource = CloudResource(**resource.dict())
     db.add(db_resource)
+    db.flush()
+    db.execute(bump_versions("cloud_resources"))
+    log_changes(db, "cloud_resources", ChangeOp.CREATE, [model_row(db_resource)])
     db.commit()
     db.refresh(db_resource)
     return db_resource
 
-@router.get("/", response_model=List[CloudResourceRead])
-def list_cloud_resources(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(CloudResource).offset(skip).limit(limit).all()
+@router.post("/bulk", response_model=BulkCreateResult)
+def bulk_create_cloud_resources(resources: List[CloudResourceCreate], db: Session = Depends(get_db)):
+    """Create many cloud resources in one transaction, with one INSERT per chunk"""
+    created_ids, created_rows = [], []
+    for chunk in chunked(resources):
+        rows = [resource.dict() for resource in chunk]
+        for row, new_id in zip(rows, insert_returning_ids(db, CloudResource, rows)):
+            created_ids.append(new_id)
+            created_rows.append({"id": new_id, **row})
+    db.execute(bump_versions("cloud_resources"))
+    log_changes(db, "cloud_resources", ChangeOp.CREATE, created_rows)
+    db.commit()
+    return {"created_ids": created_ids, "errors": []}
+
+@router.get(
+    "/",
+    response_model=Union[List[CloudResourceRead], CloudResourcePage],
+    dependencies=[Depends(etag_for("cloud_resources"))],
+)
+def list_cloud_resources(
+    response: Response,
+    skip: int = 0,
+    limit: int = LIMIT_QUERY,
+    cloud_type: Optional[CloudTypeEnum] = None,
+    name_prefix: Optional[str] = None,
+    sort: CloudResourceSort = CloudResourceSort.ID,
+    fields: Optional[str] = FIELDS_QUERY,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """List cloud resources by offset, or by keyset when a cursor is given (an empty cursor starts the first page)"""
+    requested = parse_fields(fields, CloudResourceRead.model_fields)
+    query = select(*pick_columns(_LIST_COLUMNS, requested))
+    if cloud_type is not None:
+        query = query.filter(CloudResource.cloud_type == cloud_type)
+    if name_prefix:
+        query = query.filter(CloudResource.name.startswith(name_prefix, autoescape=True))
+    if cursor is not None:
+        check_cursor_sort(sort)
+        rows = db.execute(keyset_query(query, CloudResource.id, cursor, limit)).all()
+        return page_response(keyset_page(rows, limit), response.headers)
+    order = sort_order(sort, _SORT_COLUMNS, CloudResource.id)
+    return rows_response(db.execute(query.order_by(*order).offset(skip).limit(limit)), response.headers)
+
+@router.get(
+    "/batch",
+    response_model=CloudResourceBatch,
+    dependencies=[Depends(etag_for("cloud_resources"))],
+)
+def get_cloud_resources_batch(ids: str, db: Session = Depends(get_db)):
+    """Get cloud resources by ids=1,2,3 with one query, in request order, reporting ids that were not found"""
+    id_list = parse_ids(ids)
+    rows = db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, CloudResource.id, id_list)))
+    return batch_result(rows, id_list)
+
+@router.post("/batch", response_model=CloudResourceBatch)
+def post_cloud_resources_batch(batch: BatchIds, db: Session = Depends(get_db)):
+    """Body variant of GET /batch for id lists too long for a query string"""
+    rows = db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, CloudResource.id, batch.ids)))
+    return batch_result(rows, batch.ids)
 
-@router.get("/{resource_id}", response_model=CloudResourceRead)
-def get_cloud_resource(resource_id: int, db: Session = Depends(get_db)):
+@router.get(
+    "/search",
+    response_model=List[CloudResourceMatch],
+    dependencies=[Depends(etag_for("cloud_resources"))],
+)
+def search_cloud_resources(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS),
+    db: Session = Depends(get_db)
+):
+    """Fuzzy-match resource names against q, best match first
+
+    Uses the pg_trgm index on Postgres and an in-process trigram index elsewhere; both score like similarity().
+    """
+    return search_resources(db, q, limit)
+
+@router.get(
+    "/{resource_id}",
+    response_model=CloudResourceRead,
+)
+def get_cloud_resource(resource_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    key = ("GET /cloud_resources/{resource_id}", resource_id)
+    cached = response_cache.get(key, request)
+    if cached is not None:
+        return cached
+    generation = response_cache.generation()
+    check_etag(request, response, table_etag(db, "cloud_resources"))
     resource = db.query(CloudResource).filter(CloudResource.id == resource_id).first()
     if not resource:
         raise HTTPException(status_code=404, detail="CloudResource not found")
-    return resource
+    return response_cache.store(key, CloudResourceRead, resource, [("cloud_resource", resource_id)], generation, response.headers)
 
-@router.get("/{resource_id}/detailed", response_model=CloudResourceWithDevelopers)
-def get_cloud_resource_with_developers(resource_id: int, db: Session = Depends(get_db)):
-    """Get cloud resource with all developer permissions"""
-    resource = db.query(CloudResource).filter(CloudResource.id == resource_id).first()
+@router.get(
+    "/{resource_id}/detailed",
+    response_model=CloudResourceWithDevelopers,
+    dependencies=[Depends(etag_for("developers", "cloud_resources", "permissions"))],
+)
+def get_cloud_resource_with_developers(
+    resource_id: int,
+    response: Response,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Session = Depends(get_db)
+):
+    """Get cloud resource with all developer permissions; leaving permissions out of fields skips loading them"""
+    requested = parse_fields(fields, CloudResourceWithDevelopers.model_fields)
+    query = db.query(CloudResource)
+    if requested is None or "permissions" in requested:
+        # Load grants and their developers up front instead of one lazy SELECT per grant
+        query = query.options(selectinload(CloudResource.permissions).joinedload(Permission.developer))
+    if requested is not None:
+        query = query.options(load_only_requested(CloudResource, requested))
+    resource = query.filter(CloudResource.id == resource_id).first()
     if not resource:
         raise HTTPException(status_code=404, detail="CloudResource not found")
-    return resource
+    if requested is None:
+        return resource
+    return FastJSONResponse(sparse_item(resource, requested, _DETAILED_NESTED), headers=response.headers)
 
 @router.put("/{resource_id}", response_model=CloudResourceRead)
 def update_cloud_resource(resource_id: int, resource: CloudResourceCreate, db: Session = Depends(get_db)):
@@ -42,15 +172,27 @@ def update_cloud_resource(resource_id: int, resource: CloudResourceCreate, db: S
         raise HTTPException(status_code=404, detail="CloudResource not found")
     for key, value in resource.dict().items():
         setattr(db_resource, key, value)
+    db.flush()
+    db.execute(bump_versions("cloud_resources"))
+    log_changes(db, "cloud_resources", ChangeOp.UPDATE, [model_row(db_resource)])
     db.commit()
     db.refresh(db_resource)
+    response_cache.invalidate(("cloud_resource", resource_id))
     return db_resource
 
 @router.delete("/{resource_id}", response_model=dict)
 def delete_cloud_resource(resource_id: int, db: Session = Depends(get_db)):
-    db_resource = db.query(CloudResource).filter(CloudResource.id == resource_id).first()
+    db_resource = db.query(CloudResource).filter(CloudResource.id == resource_id).with_for_update().first()
     if not db_resource:
         raise HTTPException(status_code=404, detail="CloudResource not found")
+    cascaded = delete_cascaded(db, Permission, Permission.resource_id == resource_id)
     db.delete(db_resource)
+    db.flush()
+    db.execute(bump_versions("cloud_resources"))
+    if cascaded:
+        db.execute(bump_versions("permissions"))
+    log_changes(db, "permissions", ChangeOp.DELETE, cascaded)
+    log_changes(db, "cloud_resources", ChangeOp.DELETE, [{"id": resource_id}])
     db.commit()
+    response_cache.invalidate(("cloud_resource", resource_id))
     return {"ok": True}
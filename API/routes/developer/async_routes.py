@@ -0,0 +1,324 @@
+from typing import List, Optional, Union
+
+from batch import batch_result, ids_filter, parse_ids
+from bulk import async_insert_returning_ids, chunked
+from cache import response_cache
+from changes import async_delete_cascaded, async_log_changes, model_row
+from db import get_async_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastjson import FastJSONResponse, page_response, rows_response, schema_columns
+from fieldsets import FIELDS_QUERY, load_only_requested, parse_fields, pick_columns, sparse_item
+from models import CloudResource, CloudTypeEnum, Developer, Permission, PermissionEnum
+from pagination import LIMIT_QUERY, check_cursor_sort, keyset_page, keyset_query, sort_order
+from pydantic import TypeAdapter
+from schemas import (
+    BatchIds,
+    BulkCreateResult,
+    BulkDeleteResult,
+    ChangeOp,
+    DeveloperBatch,
+    DeveloperCreate,
+    DeveloperPage,
+    DeveloperRead,
+    DeveloperSort,
+    DeveloperWithResources,
+    HighPrivilegeDeveloperPage,
+    PermissionWithResource
+)
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from versions import async_etag_for, async_table_etag, bump_versions, check_etag
+
+router = APIRouter(prefix="/developers", tags=["developer"])
+
+_SORT_COLUMNS = {"id": Developer.id, "name": Developer.name, "email": Developer.email}
+_LIST_COLUMNS = schema_columns(DeveloperRead, Developer)
+_DETAILED_NESTED = {"permissions": TypeAdapter(List[PermissionWithResource])}
+
+@router.post("/", response_model=DeveloperRead)
+async def create_developer(developer: DeveloperCreate, db: AsyncSession = Depends(get_async_db)):
+    db_dev = Developer(name=developer.name, email=developer.email)
+    db.add(db_dev)
+    try:
+        await db.flush()
+        await db.execute(bump_versions("developers"))
+        await async_log_changes(db, "developers", ChangeOp.CREATE, [model_row(db_dev)])
+        await db.commit()
+        await db.refresh(db_dev)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Developer with this email already exists.")
+    return db_dev
+
+@router.post("/bulk", response_model=BulkCreateResult)
+async def bulk_create_developers(developers: List[DeveloperCreate], db: AsyncSession = Depends(get_async_db)):
+    """Create many developers in one transaction, with one INSERT per chunk"""
+    created_ids = [None] * len(developers)
+    created_rows = []
+    errors = []
+    seen_emails = set()
+    try:
+        for chunk in chunked(list(enumerate(developers))):
+            emails = [developer.email for _, developer in chunk]
+            existing = set(await db.scalars(select(Developer.email).filter(Developer.email.in_(emails))))
+            indexes, rows = [], []
+            for index, developer in chunk:
+                if developer.email in existing or developer.email in seen_emails:
+                    errors.append({"index": index, "detail": "Developer with this email already exists."})
+                    continue
+                seen_emails.add(developer.email)
+                indexes.append(index)
+                rows.append(developer.dict())
+            for index, row, new_id in zip(indexes, rows, await async_insert_returning_ids(db, Developer, rows)):
+                created_ids[index] = new_id
+                created_rows.append({"id": new_id, **row})
+        await db.execute(bump_versions("developers"))
+        await async_log_changes(db, "developers", ChangeOp.CREATE, created_rows)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Bulk create conflicted with a concurrent write; nothing was created.")
+    return {"created_ids": created_ids, "errors": errors}
+
+@router.delete("/", response_model=BulkDeleteResult)
+async def bulk_delete_developers(ids: str, db: AsyncSession = Depends(get_async_db)):
+    """Delete developers by ids=1,2,3 and their permissions, with one set-based DELETE per table"""
+    id_list = parse_ids(ids)
+    # Locked in id order, so overlapping bulk deletes queue on one another instead of deadlocking
+    locked = (
+        select(Developer.id)
+        .where(ids_filter(db, Developer.id, id_list))
+        .order_by(Developer.id)
+        .with_for_update()
+    )
+    deleted = set(await db.scalars(locked))
+    # Nothing matched: leave the versions, and every ETag and cache entry built on them, alone
+    if deleted:
+        cascaded = await async_delete_cascaded(db, Permission, ids_filter(db, Permission.developer_id, list(deleted)))
+        stmt = (
+            delete(Developer)
+            .where(ids_filter(db, Developer.id, list(deleted)))
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(stmt)
+        await db.execute(bump_versions("developers"))
+        if cascaded:
+            await db.execute(bump_versions("permissions"))
+        await async_log_changes(db, "permissions", ChangeOp.DELETE, cascaded)
+        await async_log_changes(
+            db, "developers", ChangeOp.DELETE, [{"id": developer_id} for developer_id in sorted(deleted)]
+        )
+        await db.commit()
+        response_cache.invalidate(*(("developer", developer_id) for developer_id in deleted))
+    requested = list(dict.fromkeys(id_list))
+    return {
+        "deleted_ids": [developer_id for developer_id in requested if developer_id in deleted],
+        "missing_ids": [developer_id for developer_id in requested if developer_id not in deleted],
+    }
+
+@router.get(
+    "/",
+    response_model=Union[List[DeveloperRead], DeveloperPage],
+    dependencies=[Depends(async_etag_for("developers"))],
+)
+async def list_developers(
+    response: Response,
+    skip: int = 0,
+    limit: int = LIMIT_QUERY,
+    name: Optional[str] = None,
+    email: Optional[str] = None,
+    sort: DeveloperSort = DeveloperSort.ID,
+    fields: Optional[str] = FIELDS_QUERY,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List developers by offset, or by keyset when a cursor is given (an empty cursor starts the first page)
+
+    name matches case-insensitively; email matches exactly.
+    """
+    requested = parse_fields(fields, DeveloperRead.model_fields)
+    query = select(*pick_columns(_LIST_COLUMNS, requested))
+    if name is not None:
+        query = query.filter(func.lower(Developer.name) == name.lower())
+    if email is not None:
+        query = query.filter(Developer.email == email)
+    if cursor is not None:
+        check_cursor_sort(sort)
+        result = await db.execute(keyset_query(query, Developer.id, cursor, limit))
+        return page_response(keyset_page(result.all(), limit), response.headers)
+    order = sort_order(sort, _SORT_COLUMNS, Developer.id)
+    result = await db.execute(query.order_by(*order).offset(skip).limit(limit))
+    return rows_response(result, response.headers)
+
+@router.get(
+    "/batch",
+    response_model=DeveloperBatch,
+    dependencies=[Depends(async_etag_for("developers"))],
+)
+async def get_developers_batch(ids: str, db: AsyncSession = Depends(get_async_db)):
+    """Get developers by ids=1,2,3 with one query, in request order, reporting ids that were not found"""
+    id_list = parse_ids(ids)
+    rows = await db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, Developer.id, id_list)))
+    return batch_result(rows, id_list)
+
+@router.post("/batch", response_model=DeveloperBatch)
+async def post_developers_batch(batch: BatchIds, db: AsyncSession = Depends(get_async_db)):
+    """Body variant of GET /batch for id lists too long for a query string"""
+    rows = await db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, Developer.id, batch.ids)))
+    return batch_result(rows, batch.ids)
+
+@router.get("/lookup", response_model=List[DeveloperRead], dependencies=[Depends(async_etag_for("developers"))])
+async def lookup_developers(
+    email: Optional[str] = None,
+    name: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Resolve a developer by exact email or case-insensitive name with one indexed query
+
+    Names are not unique, so every match is returned; no match is a 404.
+    """
+    if (email is None) == (name is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of email or name")
+    if email is not None:
+        query = select(Developer).filter(Developer.email == email)
+    else:
+        query = select(Developer).filter(func.lower(Developer.name) == name.lower())
+    developers = (await db.scalars(query.order_by(Developer.id))).all()
+    if not developers:
+        raise HTTPException(status_code=404, detail="Developer not found")
+    return developers
+
+_WRITE_LEVELS = (PermissionEnum.WRITE, PermissionEnum.RW)
+
+@router.get(
+    "/high-privilege",
+    response_model=HighPrivilegeDeveloperPage,
+    dependencies=[Depends(async_etag_for("developers", "cloud_resources", "permissions"))],
+)
+async def list_high_privilege_developers(
+    min_resources: int = 5,
+    cloud_type: Optional[CloudTypeEnum] = None,
+    write_only: bool = False,
+    limit: int = LIMIT_QUERY,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List developers with grants on at least min_resources resources, using one GROUP BY/HAVING per page
+
+    cloud_type and write_only narrow which grants are counted, for the threshold and the totals alike.
+    """
+    total = func.count(Permission.id)
+    query = (
+        select(
+            Developer.id,
+            Developer.name,
+            Developer.email,
+            total.label("total_resources"),
+            func.count(case((Permission.permission.in_(_WRITE_LEVELS), 1))).label("write_grants"),
+            *(func.count(case((CloudResource.cloud_type == cloud, 1))).label(cloud.value) for cloud in CloudTypeEnum),
+        )
+        .join(Permission, Permission.developer_id == Developer.id)
+        .join(CloudResource, Permission.resource_id == CloudResource.id)
+        .group_by(Developer.id, Developer.name, Developer.email)
+        .having(total >= min_resources)
+    )
+    if cloud_type is not None:
+        query = query.where(CloudResource.cloud_type == cloud_type)
+    if write_only:
+        query = query.where(Permission.permission.in_(_WRITE_LEVELS))
+
+    result = await db.execute(keyset_query(query, Developer.id, cursor, limit))
+    page = keyset_page(result.all(), limit)
+    page["items"] = [
+        {
+            "id": row.id,
+            "name": row.name,
+            "email": row.email,
+            "total_resources": row.total_resources,
+            "by_cloud_type": {cloud.value: getattr(row, cloud.value) for cloud in CloudTypeEnum},
+            "write_grants": row.write_grants,
+        }
+        for row in page["items"]
+    ]
+    return page
+
+@router.get(
+    "/{developer_id}",
+    response_model=DeveloperRead,
+)
+async def get_developer(developer_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    key = ("GET /developers/{developer_id}", developer_id)
+    cached = response_cache.get(key, request)
+    if cached is not None:
+        return cached
+    generation = response_cache.generation()
+    check_etag(request, response, await async_table_etag(db, "developers"))
+    dev = await db.get(Developer, developer_id)
+    if not dev:
+        raise HTTPException(status_code=404, detail="Developer not found")
+    return response_cache.store(key, DeveloperRead, dev, [("developer", developer_id)], generation, response.headers)
+
+@router.get(
+    "/{developer_id}/detailed",
+    response_model=DeveloperWithResources,
+    dependencies=[Depends(async_etag_for("developers", "cloud_resources", "permissions"))],
+)
+async def get_developer_with_resources(
+    developer_id: int,
+    response: Response,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get developer with all their resource permissions; leaving permissions out of fields skips loading them"""
+    requested = parse_fields(fields, DeveloperWithResources.model_fields)
+    query = select(Developer)
+    if requested is None or "permissions" in requested:
+        # Lazy loads cannot run during serialization on the event loop, so load eagerly
+        query = query.options(selectinload(Developer.permissions).joinedload(Permission.cloud_resource))
+    if requested is not None:
+        query = query.options(load_only_requested(Developer, requested))
+    result = await db.execute(query.filter(Developer.id == developer_id))
+    dev = result.scalars().first()
+    if not dev:
+        raise HTTPException(status_code=404, detail="Developer not found")
+    if requested is None:
+        return dev
+    return FastJSONResponse(sparse_item(dev, requested, _DETAILED_NESTED), headers=response.headers)
+
+@router.put("/{developer_id}", response_model=DeveloperRead)
+async def update_developer(developer_id: int, developer: DeveloperCreate, db: AsyncSession = Depends(get_async_db)):
+    db_dev = await db.get(Developer, developer_id)
+    if not db_dev:
+        raise HTTPException(status_code=404, detail="Developer not found")
+    db_dev.name = developer.name
+    db_dev.email = developer.email
+    try:
+        await db.flush()
+        await db.execute(bump_versions("developers"))
+        await async_log_changes(db, "developers", ChangeOp.UPDATE, [model_row(db_dev)])
+        await db.commit()
+        await db.refresh(db_dev)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Developer with this email already exists.")
+    response_cache.invalidate(("developer", developer_id))
+    return db_dev
+
+@router.delete("/{developer_id}", response_model=dict)
+async def delete_developer(developer_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_dev = await db.get(Developer, developer_id, with_for_update=True)
+    if not db_dev:
+        raise HTTPException(status_code=404, detail="Developer not found")
+    cascaded = await async_delete_cascaded(db, Permission, Permission.developer_id == developer_id)
+    await db.delete(db_dev)
+    await db.flush()
+    await db.execute(bump_versions("developers"))
+    if cascaded:
+        await db.execute(bump_versions("permissions"))
+    await async_log_changes(db, "permissions", ChangeOp.DELETE, cascaded)
+    await async_log_changes(db, "developers", ChangeOp.DELETE, [{"id": developer_id}])
+    await db.commit()
+    response_cache.invalidate(("developer", developer_id))
+    return {"ok": True}
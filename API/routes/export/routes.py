@@ -0,0 +1,14 @@
+from db import get_db
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from models import Permission
+from sqlalchemy.orm import Session
+from streaming import permission_graph_query, stream_ndjson
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+@router.get("/permissions.ndjson", response_class=StreamingResponse)
+def export_permissions(db: Session = Depends(get_db)):
+    """Stream every permission joined with its developer and resource, one JSON object per line"""
+    query = permission_graph_query().order_by(Permission.id)
+    return StreamingResponse(stream_ndjson(db.get_bind(), query), media_type="application/x-ndjson")
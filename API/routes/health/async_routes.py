@@ -0,0 +1,16 @@
+from db import get_async_db
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/ready", response_model=dict)
+async def readiness(db: AsyncSession = Depends(get_async_db)):
+    """Ready for traffic once a pooled database connection answers SELECT 1; 503 takes the worker out of rotation"""
+    try:
+        await db.execute(text("SELECT 1"))
+    except (SQLAlchemyError, OSError):
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ok", "database": "ok"}
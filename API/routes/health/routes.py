@@ -0,0 +1,21 @@
+from db import get_db
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/live", response_model=dict)
+async def liveness():
+    """The worker's event loop is answering; restarting it would not fix the database, so this never queries it"""
+    return {"status": "ok"}
+
+@router.get("/ready", response_model=dict)
+def readiness(db: Session = Depends(get_db)):
+    """Ready for traffic once a pooled database connection answers SELECT 1; 503 takes the worker out of rotation"""
+    try:
+        db.execute(text("SELECT 1"))
+    except (SQLAlchemyError, OSError):
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ok", "database": "ok"}
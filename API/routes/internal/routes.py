@@ -0,0 +1,20 @@
+from cache import response_cache
+from db import DB_MAX_OVERFLOW, DB_MODE, async_engine, engine
+from fastapi import APIRouter
+from pool_metrics import pool_status
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+@router.get("/pool", response_model=dict)
+def get_pool_status():
+    """Report connection pool occupancy and checkout times for sizing the pool"""
+    return {
+        "mode": DB_MODE,
+        "sync": pool_status(engine.pool, DB_MAX_OVERFLOW),
+        "async": pool_status(async_engine.sync_engine.pool, DB_MAX_OVERFLOW),
+    }
+
+@router.get("/cache", response_model=dict)
+def get_cache_stats():
+    """Report response cache occupancy and hit/miss/eviction counters for tuning its size"""
+    return response_cache.stats()
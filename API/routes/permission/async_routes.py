@@ -0,0 +1,328 @@
+from typing import List, Optional, Union
+
+from batch import batch_result, ids_filter, parse_ids
+from bulk import async_insert_returning_ids, chunked
+from cache import developer_permissions_tags, response_cache
+from changes import async_log_changes
+from db import get_async_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastjson import page_response, rows_response, schema_columns
+from fieldsets import FIELDS_QUERY, parse_fields, pick_columns
+from integrity import (
+    duplicate_permission_error,
+    is_unique_violation,
+    missing_parent_error,
+    parent_ids_query,
+    split_parent_ids
+)
+from models import Permission, Developer, CloudResource
+from pagination import LIMIT_QUERY, keyset_page, keyset_query
+from schemas import (
+    BatchIds,
+    BulkCreateResult,
+    BulkUpsertResult,
+    ChangeOp,
+    PermissionBatch,
+    PermissionCreate,
+    PermissionPage,
+    PermissionRead,
+    PermissionWithDeveloper,
+    PermissionWithResource
+)
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from versions import async_etag_for, async_table_etag, bump_versions, check_etag
+
+router = APIRouter(prefix="/permissions", tags=["permissions"])
+
+# Columns handed back by INSERT/UPDATE ... RETURNING, so writes need no refresh SELECT
+_RETURNED_COLUMNS = (Permission.id, Permission.developer_id, Permission.resource_id, Permission.permission)
+_LIST_COLUMNS = schema_columns(PermissionRead, Permission)
+
+async def _existing_parent_ids(db: AsyncSession, developer_ids, resource_ids):
+    """Find which of the given developer and resource ids exist, in a single query"""
+    return split_parent_ids(await db.execute(parent_ids_query(developer_ids, resource_ids)))
+
+async def _write_error(db: AsyncSession, exc: IntegrityError, permission: PermissionCreate) -> HTTPException:
+    """Map a failed permission write to the same errors the pre-validation SELECTs used to raise"""
+    if is_unique_violation(exc):
+        return duplicate_permission_error(permission)
+    developer_ids, _ = await _existing_parent_ids(db, {permission.developer_id}, {permission.resource_id})
+    return missing_parent_error(permission, developer_ids)
+
+@router.post("/", response_model=PermissionRead)
+async def create_permission(permission: PermissionCreate, db: AsyncSession = Depends(get_async_db)):
+    # The foreign key and unique constraints do the validation, so the happy path is one INSERT
+    stmt = insert(Permission).values(**permission.dict()).returning(*_RETURNED_COLUMNS)
+    try:
+        row = (await db.execute(stmt)).one()
+        await db.execute(bump_versions("permissions"))
+        await async_log_changes(db, "permissions", ChangeOp.CREATE, [row._asdict()])
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise await _write_error(db, exc, permission)
+    response_cache.invalidate(("developer_permissions", permission.developer_id))
+    return row._asdict()
+
+@router.post("/bulk", response_model=BulkCreateResult)
+async def bulk_create_permissions(permissions: List[PermissionCreate], db: AsyncSession = Depends(get_async_db)):
+    """Create many permissions in one transaction, validating each chunk with set-based queries"""
+    created_ids = [None] * len(permissions)
+    created_rows = []
+    errors = []
+    seen_pairs = set()
+    try:
+        for chunk in chunked(list(enumerate(permissions))):
+            pairs = {(permission.developer_id, permission.resource_id) for _, permission in chunk}
+            developer_ids, resource_ids = await _existing_parent_ids(
+                db, {developer_id for developer_id, _ in pairs}, {resource_id for _, resource_id in pairs}
+            )
+            existing = await db.execute(
+                select(Permission.developer_id, Permission.resource_id)
+                .filter(tuple_(Permission.developer_id, Permission.resource_id).in_(pairs))
+            )
+            existing_pairs = set(existing.tuples())
+            indexes, rows = [], []
+            for index, permission in chunk:
+                pair = (permission.developer_id, permission.resource_id)
+                if permission.developer_id not in developer_ids:
+                    detail = "Developer not found"
+                elif permission.resource_id not in resource_ids:
+                    detail = "CloudResource not found"
+                elif pair in existing_pairs or pair in seen_pairs:
+                    detail = duplicate_permission_error(permission).detail
+                else:
+                    seen_pairs.add(pair)
+                    indexes.append(index)
+                    rows.append(permission.dict())
+                    continue
+                errors.append({"index": index, "detail": detail})
+            for index, row, new_id in zip(indexes, rows, await async_insert_returning_ids(db, Permission, rows)):
+                created_ids[index] = new_id
+                created_rows.append({"id": new_id, **row})
+        await db.execute(bump_versions("permissions"))
+        await async_log_changes(db, "permissions", ChangeOp.CREATE, created_rows)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Bulk create conflicted with a concurrent write; nothing was created.")
+    response_cache.invalidate(*{("developer_permissions", permission.developer_id) for permission in permissions})
+    return {"created_ids": created_ids, "errors": errors}
+
+def _upsert_statement(db: AsyncSession, rows):
+    """INSERT ... ON CONFLICT (developer_id, resource_id) DO UPDATE for the session's dialect"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(Permission).values(rows)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(Permission).values(rows)
+    else:
+        raise HTTPException(status_code=501, detail=f"Upsert is not supported on {dialect}")
+    return stmt.on_conflict_do_update(
+        index_elements=[Permission.developer_id, Permission.resource_id],
+        set_={"permission": stmt.excluded.permission},
+    ).returning(*_RETURNED_COLUMNS)
+
+@router.put("/upsert", response_model=PermissionRead)
+async def upsert_permission(permission: PermissionCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a permission, or change its level if the developer already has one on the resource"""
+    try:
+        row = (await db.execute(_upsert_statement(db, [permission.dict()]))).one()
+        await db.execute(bump_versions("permissions"))
+        await async_log_changes(db, "permissions", ChangeOp.UPSERT, [row._asdict()])
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise await _write_error(db, exc, permission)
+    response_cache.invalidate(("developer_permissions", permission.developer_id))
+    return row._asdict()
+
+@router.put("/upsert/bulk", response_model=BulkUpsertResult)
+async def bulk_upsert_permissions(permissions: List[PermissionCreate], db: AsyncSession = Depends(get_async_db)):
+    """Upsert many permissions in one transaction, with one statement per chunk
+
+    When a pair appears more than once in the request, the last entry wins.
+    """
+    latest = {}
+    for index, permission in enumerate(permissions):
+        latest[(permission.developer_id, permission.resource_id)] = index
+
+    ids = [None] * len(permissions)
+    upserted_rows = []
+    errors = {}
+    try:
+        for chunk in chunked(sorted(latest.items(), key=lambda item: item[1])):
+            developer_ids, resource_ids = await _existing_parent_ids(
+                db, {developer_id for (developer_id, _), _ in chunk}, {resource_id for (_, resource_id), _ in chunk}
+            )
+            rows = []
+            for (developer_id, resource_id), index in chunk:
+                if developer_id not in developer_ids:
+                    errors[index] = "Developer not found"
+                elif resource_id not in resource_ids:
+                    errors[index] = "CloudResource not found"
+                else:
+                    rows.append(permissions[index].dict())
+            if rows:
+                for row in await db.execute(_upsert_statement(db, rows)):
+                    ids[latest[(row.developer_id, row.resource_id)]] = row.id
+                    upserted_rows.append(row._asdict())
+        await db.execute(bump_versions("permissions"))
+        await async_log_changes(db, "permissions", ChangeOp.UPSERT, upserted_rows)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Bulk upsert conflicted with a concurrent write; nothing was changed.")
+    response_cache.invalidate(*{("developer_permissions", permission.developer_id) for permission in permissions})
+
+    # Earlier duplicates of a pair share the outcome of the entry that won
+    for index, permission in enumerate(permissions):
+        winner = latest[(permission.developer_id, permission.resource_id)]
+        ids[index] = ids[winner]
+        if winner in errors:
+            errors[index] = errors[winner]
+    return {"ids": ids, "errors": [{"index": index, "detail": detail} for index, detail in sorted(errors.items())]}
+
+@router.get(
+    "/",
+    response_model=Union[List[PermissionRead], PermissionPage],
+    dependencies=[Depends(async_etag_for("permissions"))],
+)
+async def list_permissions(
+    response: Response,
+    skip: int = 0,
+    limit: int = LIMIT_QUERY,
+    developer_id: Optional[int] = None,
+    resource_id: Optional[int] = None,
+    fields: Optional[str] = FIELDS_QUERY,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get permissions with optional filtering by developer_id or resource_id, paged by offset or cursor"""
+    requested = parse_fields(fields, PermissionRead.model_fields)
+    query = select(*pick_columns(_LIST_COLUMNS, requested))
+
+    if developer_id is not None:
+        query = query.filter(Permission.developer_id == developer_id)
+
+    if resource_id is not None:
+        query = query.filter(Permission.resource_id == resource_id)
+
+    if cursor is not None:
+        result = await db.execute(keyset_query(query, Permission.id, cursor, limit))
+        return page_response(keyset_page(result.all(), limit), response.headers)
+
+    result = await db.execute(query.order_by(Permission.id).offset(skip).limit(limit))
+    return rows_response(result, response.headers)
+
+@router.get(
+    "/batch",
+    response_model=PermissionBatch,
+    dependencies=[Depends(async_etag_for("permissions"))],
+)
+async def get_permissions_batch(ids: str, db: AsyncSession = Depends(get_async_db)):
+    """Get permissions by ids=1,2,3 with one query, in request order, reporting ids that were not found"""
+    id_list = parse_ids(ids)
+    rows = await db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, Permission.id, id_list)))
+    return batch_result(rows, id_list)
+
+@router.post("/batch", response_model=PermissionBatch)
+async def post_permissions_batch(batch: BatchIds, db: AsyncSession = Depends(get_async_db)):
+    """Body variant of GET /batch for id lists too long for a query string"""
+    rows = await db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, Permission.id, batch.ids)))
+    return batch_result(rows, batch.ids)
+
+@router.get(
+    "/by-developer/{developer_id}",
+    response_model=List[PermissionWithResource],
+)
+async def get_permissions_by_developer(developer_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Get all permissions for a specific developer with resource details"""
+    key = ("GET /permissions/by-developer/{developer_id}", developer_id)
+    cached = response_cache.get(key, request)
+    if cached is not None:
+        return cached
+    generation = response_cache.generation()
+    check_etag(request, response, await async_table_etag(db, "developers", "cloud_resources", "permissions"))
+
+    developer = await db.get(Developer, developer_id)
+    if not developer:
+        raise HTTPException(status_code=404, detail="Developer not found")
+
+    result = await db.execute(
+        select(Permission)
+        .options(joinedload(Permission.cloud_resource))
+        .filter(Permission.developer_id == developer_id)
+    )
+    permissions = result.scalars().all()
+    tags = developer_permissions_tags(developer_id, permissions)
+    return response_cache.store(key, List[PermissionWithResource], permissions, tags, generation, response.headers)
+
+@router.get(
+    "/by-resource/{resource_id}",
+    response_model=List[PermissionWithDeveloper],
+    dependencies=[Depends(async_etag_for("developers", "cloud_resources", "permissions"))],
+)
+async def get_permissions_by_resource(resource_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get all permissions for a specific resource with developer details"""
+    resource = await db.get(CloudResource, resource_id)
+    if not resource:
+        raise HTTPException(status_code=404, detail="CloudResource not found")
+
+    result = await db.execute(
+        select(Permission)
+        .options(joinedload(Permission.developer))
+        .filter(Permission.resource_id == resource_id)
+    )
+    return result.scalars().all()
+
+@router.get(
+    "/{permission_id}",
+    response_model=PermissionRead,
+    dependencies=[Depends(async_etag_for("permissions"))],
+)
+async def get_permission(permission_id: int, db: AsyncSession = Depends(get_async_db)):
+    permission = await db.get(Permission, permission_id)
+    if not permission:
+        raise HTTPException(status_code=404, detail="Permission not found")
+    return permission
+
+@router.put("/{permission_id}", response_model=PermissionRead)
+async def update_permission(permission_id: int, permission: PermissionCreate, db: AsyncSession = Depends(get_async_db)):
+    stmt = (
+        update(Permission)
+        .where(Permission.id == permission_id)
+        .values(**permission.dict())
+        .returning(*_RETURNED_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        row = (await db.execute(stmt)).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Permission not found")
+        await db.execute(bump_versions("permissions"))
+        await async_log_changes(db, "permissions", ChangeOp.UPDATE, [row._asdict()])
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise await _write_error(db, exc, permission)
+    # The permission tag also reaches the developer the grant was moved away from
+    response_cache.invalidate(("permission", permission_id), ("developer_permissions", permission.developer_id))
+    return row._asdict()
+
+@router.delete("/{permission_id}", response_model=dict)
+async def delete_permission(permission_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_permission = await db.get(Permission, permission_id)
+    if not db_permission:
+        raise HTTPException(status_code=404, detail="Permission not found")
+    await db.delete(db_permission)
+    await db.flush()
+    await db.execute(bump_versions("permissions"))
+    await async_log_changes(db, "permissions", ChangeOp.DELETE, [{"id": permission_id}])
+    await db.commit()
+    response_cache.invalidate(("permission", permission_id))
+    return {"ok": True}
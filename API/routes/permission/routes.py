@@ -1,53 +1,209 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 
+from batch import batch_result, ids_filter, parse_ids
+from bulk import chunked, insert_returning_ids
+from cache import developer_permissions_tags, response_cache
+from changes import log_changes
 from db import get_db
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastjson import page_response, rows_response, schema_columns
+from fieldsets import FIELDS_QUERY, parse_fields, pick_columns
+from integrity import (
+    duplicate_permission_error,
+    is_unique_violation,
+    missing_parent_error,
+    parent_ids_query,
+    split_parent_ids
+)
 from models import Permission, Developer, CloudResource
+from pagination import LIMIT_QUERY, keyset_page, keyset_query
 from schemas import (
+    BatchIds,
+    BulkCreateResult,
+    BulkUpsertResult,
+    ChangeOp,
+    PermissionBatch,
     PermissionCreate, 
+    PermissionPage,
     PermissionRead, 
     PermissionWithDeveloper,
     PermissionWithResource
 )
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy.exc import IntegrityError
+from versions import bump_versions, check_etag, etag_for, table_etag
 
 router = APIRouter(prefix="/permissions", tags=["permissions"])
 
+# Columns handed back by INSERT/UPDATE ... RETURNING, so writes need no refresh SELECT
+_RETURNED_COLUMNS = (Permission.id, Permission.developer_id, Permission.resource_id, Permission.permission)
+_LIST_COLUMNS = schema_columns(PermissionRead, Permission)
+
+def _existing_parent_ids(db: Session, developer_ids, resource_ids):
+    """Find which of the given developer and resource ids exist, in a single query"""
+    return split_parent_ids(db.execute(parent_ids_query(developer_ids, resource_ids)))
+
+def _write_error(db: Session, exc: IntegrityError, permission: PermissionCreate) -> HTTPException:
+    """Map a failed permission write to the same errors the pre-validation SELECTs used to raise"""
+    if is_unique_violation(exc):
+        return duplicate_permission_error(permission)
+    developer_ids, _ = _existing_parent_ids(db, {permission.developer_id}, {permission.resource_id})
+    return missing_parent_error(permission, developer_ids)
+
 @router.post("/", response_model=PermissionRead)
 def create_permission(permission: PermissionCreate, db: Session = Depends(get_db)):
-    # Verify developer and resource exist
-    developer = db.query(Developer).filter(Developer.id == permission.developer_id).first()
-    if not developer:
-        raise HTTPException(status_code=404, detail="Developer not found")
-    
-    resource = db.query(CloudResource).filter(CloudResource.id == permission.resource_id).first()
-    if not resource:
-        raise HTTPException(status_code=404, detail="CloudResource not found")
-    
-    db_permission = Permission(**permission.dict())
-    db.add(db_permission)
+    # The foreign key and unique constraints do the validation, so the happy path is one INSERT
+    stmt = insert(Permission).values(**permission.dict()).returning(*_RETURNED_COLUMNS)
     try:
+        row = db.execute(stmt).one()
+        db.execute(bump_versions("permissions"))
+        log_changes(db, "permissions", ChangeOp.CREATE, [row._asdict()])
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        raise _write_error(db, exc, permission)
+    response_cache.invalidate(("developer_permissions", permission.developer_id))
+    return row._asdict()
+
+@router.post("/bulk", response_model=BulkCreateResult)
+def bulk_create_permissions(permissions: List[PermissionCreate], db: Session = Depends(get_db)):
+    """Create many permissions in one transaction, validating each chunk with set-based queries"""
+    created_ids = [None] * len(permissions)
+    created_rows = []
+    errors = []
+    seen_pairs = set()
+    try:
+        for chunk in chunked(list(enumerate(permissions))):
+            pairs = {(permission.developer_id, permission.resource_id) for _, permission in chunk}
+            developer_ids, resource_ids = _existing_parent_ids(
+                db, {developer_id for developer_id, _ in pairs}, {resource_id for _, resource_id in pairs}
+            )
+            existing_pairs = set(
+                db.query(Permission.developer_id, Permission.resource_id)
+                .filter(tuple_(Permission.developer_id, Permission.resource_id).in_(pairs))
+                .all()
+            )
+            indexes, rows = [], []
+            for index, permission in chunk:
+                pair = (permission.developer_id, permission.resource_id)
+                if permission.developer_id not in developer_ids:
+                    detail = "Developer not found"
+                elif permission.resource_id not in resource_ids:
+                    detail = "CloudResource not found"
+                elif pair in existing_pairs or pair in seen_pairs:
+                    detail = duplicate_permission_error(permission).detail
+                else:
+                    seen_pairs.add(pair)
+                    indexes.append(index)
+                    rows.append(permission.dict())
+                    continue
+                errors.append({"index": index, "detail": detail})
+            for index, row, new_id in zip(indexes, rows, insert_returning_ids(db, Permission, rows)):
+                created_ids[index] = new_id
+                created_rows.append({"id": new_id, **row})
+        db.execute(bump_versions("permissions"))
+        log_changes(db, "permissions", ChangeOp.CREATE, created_rows)
         db.commit()
-        db.refresh(db_permission)
     except IntegrityError:
         db.rollback()
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Permission already exists for developer {permission.developer_id} and resource {permission.resource_id}"
-        )
-    return db_permission
+        raise HTTPException(status_code=400, detail="Bulk create conflicted with a concurrent write; nothing was created.")
+    response_cache.invalidate(*{("developer_permissions", permission.developer_id) for permission in permissions})
+    return {"created_ids": created_ids, "errors": errors}
+
+def _upsert_statement(db: Session, rows):
+    """INSERT ... ON CONFLICT (developer_id, resource_id) DO UPDATE for the session's dialect"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(Permission).values(rows)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(Permission).values(rows)
+    else:
+        raise HTTPException(status_code=501, detail=f"Upsert is not supported on {dialect}")
+    return stmt.on_conflict_do_update(
+        index_elements=[Permission.developer_id, Permission.resource_id],
+        set_={"permission": stmt.excluded.permission},
+    ).returning(*_RETURNED_COLUMNS)
 
-@router.get("/", response_model=List[PermissionRead])
+@router.put("/upsert", response_model=PermissionRead)
+def upsert_permission(permission: PermissionCreate, db: Session = Depends(get_db)):
+    """Create a permission, or change its level if the developer already has one on the resource"""
+    try:
+        row = db.execute(_upsert_statement(db, [permission.dict()])).one()
+        db.execute(bump_versions("permissions"))
+        log_changes(db, "permissions", ChangeOp.UPSERT, [row._asdict()])
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        raise _write_error(db, exc, permission)
+    response_cache.invalidate(("developer_permissions", permission.developer_id))
+    return row._asdict()
+
+@router.put("/upsert/bulk", response_model=BulkUpsertResult)
+def bulk_upsert_permissions(permissions: List[PermissionCreate], db: Session = Depends(get_db)):
+    """Upsert many permissions in one transaction, with one statement per chunk
+
+    When a pair appears more than once in the request, the last entry wins.
+    """
+    latest = {}
+    for index, permission in enumerate(permissions):
+        latest[(permission.developer_id, permission.resource_id)] = index
+
+    ids = [None] * len(permissions)
+    upserted_rows = []
+    errors = {}
+    try:
+        for chunk in chunked(sorted(latest.items(), key=lambda item: item[1])):
+            developer_ids, resource_ids = _existing_parent_ids(
+                db, {developer_id for (developer_id, _), _ in chunk}, {resource_id for (_, resource_id), _ in chunk}
+            )
+            rows = []
+            for (developer_id, resource_id), index in chunk:
+                if developer_id not in developer_ids:
+                    errors[index] = "Developer not found"
+                elif resource_id not in resource_ids:
+                    errors[index] = "CloudResource not found"
+                else:
+                    rows.append(permissions[index].dict())
+            if rows:
+                for row in db.execute(_upsert_statement(db, rows)):
+                    ids[latest[(row.developer_id, row.resource_id)]] = row.id
+                    upserted_rows.append(row._asdict())
+        db.execute(bump_versions("permissions"))
+        log_changes(db, "permissions", ChangeOp.UPSERT, upserted_rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Bulk upsert conflicted with a concurrent write; nothing was changed.")
+    response_cache.invalidate(*{("developer_permissions", permission.developer_id) for permission in permissions})
+
+    # Earlier duplicates of a pair share the outcome of the entry that won
+    for index, permission in enumerate(permissions):
+        winner = latest[(permission.developer_id, permission.resource_id)]
+        ids[index] = ids[winner]
+        if winner in errors:
+            errors[index] = errors[winner]
+    return {"ids": ids, "errors": [{"index": index, "detail": detail} for index, detail in sorted(errors.items())]}
+
+@router.get(
+    "/",
+    response_model=Union[List[PermissionRead], PermissionPage],
+    dependencies=[Depends(etag_for("permissions"))],
+)
 def list_permissions(
+    response: Response,
     skip: int = 0, 
-    limit: int = 100, 
+    limit: int = LIMIT_QUERY, 
     developer_id: Optional[int] = None,
     resource_id: Optional[int] = None,
+    fields: Optional[str] = FIELDS_QUERY,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get permissions with optional filtering by developer_id or resource_id"""
-    query = db.query(Permission)
+    """Get permissions with optional filtering by developer_id or resource_id, paged by offset or cursor"""
+    requested = parse_fields(fields, PermissionRead.model_fields)
+    query = select(*pick_columns(_LIST_COLUMNS, requested))
     
     if developer_id is not None:
         query = query.filter(Permission.developer_id == developer_id)
@@ -55,29 +211,79 @@ def list_permissions(
     if resource_id is not None:
         query = query.filter(Permission.resource_id == resource_id)
     
-    return query.offset(skip).limit(limit).all()
+    if cursor is not None:
+        rows = db.execute(keyset_query(query, Permission.id, cursor, limit)).all()
+        return page_response(keyset_page(rows, limit), response.headers)
+
+    return rows_response(db.execute(query.order_by(Permission.id).offset(skip).limit(limit)), response.headers)
 
-@router.get("/by-developer/{developer_id}", response_model=List[PermissionWithResource])
-def get_permissions_by_developer(developer_id: int, db: Session = Depends(get_db)):
+@router.get(
+    "/batch",
+    response_model=PermissionBatch,
+    dependencies=[Depends(etag_for("permissions"))],
+)
+def get_permissions_batch(ids: str, db: Session = Depends(get_db)):
+    """Get permissions by ids=1,2,3 with one query, in request order, reporting ids that were not found"""
+    id_list = parse_ids(ids)
+    rows = db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, Permission.id, id_list)))
+    return batch_result(rows, id_list)
+
+@router.post("/batch", response_model=PermissionBatch)
+def post_permissions_batch(batch: BatchIds, db: Session = Depends(get_db)):
+    """Body variant of GET /batch for id lists too long for a query string"""
+    rows = db.execute(select(*_LIST_COLUMNS).where(ids_filter(db, Permission.id, batch.ids)))
+    return batch_result(rows, batch.ids)
+
+@router.get(
+    "/by-developer/{developer_id}",
+    response_model=List[PermissionWithResource],
+)
+def get_permissions_by_developer(developer_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """Get all permissions for a specific developer with resource details"""
+    key = ("GET /permissions/by-developer/{developer_id}", developer_id)
+    cached = response_cache.get(key, request)
+    if cached is not None:
+        return cached
+    generation = response_cache.generation()
+    check_etag(request, response, table_etag(db, "developers", "cloud_resources", "permissions"))
+
     developer = db.query(Developer).filter(Developer.id == developer_id).first()
     if not developer:
         raise HTTPException(status_code=404, detail="Developer not found")
     
-    permissions = db.query(Permission).filter(Permission.developer_id == developer_id).all()
-    return permissions
+    permissions = (
+        db.query(Permission)
+        .options(joinedload(Permission.cloud_resource))
+        .filter(Permission.developer_id == developer_id)
+        .all()
+    )
+    tags = developer_permissions_tags(developer_id, permissions)
+    return response_cache.store(key, List[PermissionWithResource], permissions, tags, generation, response.headers)
 
-@router.get("/by-resource/{resource_id}", response_model=List[PermissionWithDeveloper])
+@router.get(
+    "/by-resource/{resource_id}",
+    response_model=List[PermissionWithDeveloper],
+    dependencies=[Depends(etag_for("developers", "cloud_resources", "permissions"))],
+)
 def get_permissions_by_resource(resource_id: int, db: Session = Depends(get_db)):
     """Get all permissions for a specific resource with developer details"""
     resource = db.query(CloudResource).filter(CloudResource.id == resource_id).first()
     if not resource:
         raise HTTPException(status_code=404, detail="CloudResource not found")
     
-    permissions = db.query(Permission).filter(Permission.resource_id == resource_id).all()
+    permissions = (
+        db.query(Permission)
+        .options(joinedload(Permission.developer))
+        .filter(Permission.resource_id == resource_id)
+        .all()
+    )
     return permissions
 
-@router.get("/{permission_id}", response_model=PermissionRead)
+@router.get(
+    "/{permission_id}",
+    response_model=PermissionRead,
+    dependencies=[Depends(etag_for("permissions"))],
+)
 def get_permission(permission_id: int, db: Session = Depends(get_db)):
     permission = db.query(Permission).filter(Permission.id == permission_id).first()
     if not permission:
@@ -86,34 +292,26 @@ def get_permission(permission_id: int, db: Session = Depends(get_db)):
 
 @router.put("/{permission_id}", response_model=PermissionRead)
 def update_permission(permission_id: int, permission: PermissionCreate, db: Session = Depends(get_db)):
-    db_permission = db.query(Permission).filter(Permission.id == permission_id).first()
-    if not db_permission:
-        raise HTTPException(status_code=404, detail="Permission not found")
-    
-    # Verify developer and resource exist if they're being changed
-    if permission.developer_id != db_permission.developer_id:
-        developer = db.query(Developer).filter(Developer.id == permission.developer_id).first()
-        if not developer:
-            raise HTTPException(status_code=404, detail="Developer not found")
-    
-    if permission.resource_id != db_permission.resource_id:
-        resource = db.query(CloudResource).filter(CloudResource.id == permission.resource_id).first()
-        if not resource:
-            raise HTTPException(status_code=404, detail="CloudResource not found")
-    
-    for key, value in permission.dict().items():
-        setattr(db_permission, key, value)
-    
+    stmt = (
+        update(Permission)
+        .where(Permission.id == permission_id)
+        .values(**permission.dict())
+        .returning(*_RETURNED_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
     try:
+        row = db.execute(stmt).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Permission not found")
+        db.execute(bump_versions("permissions"))
+        log_changes(db, "permissions", ChangeOp.UPDATE, [row._asdict()])
         db.commit()
-        db.refresh(db_permission)
-    except IntegrityError:
+    except IntegrityError as exc:
         db.rollback()
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Permission already exists for developer {permission.developer_id} and resource {permission.resource_id}"
-        )
-    return db_permission
+        raise _write_error(db, exc, permission)
+    # The permission tag also reaches the developer the grant was moved away from
+    response_cache.invalidate(("permission", permission_id), ("developer_permissions", permission.developer_id))
+    return row._asdict()
 
 @router.delete("/{permission_id}", response_model=dict)
 def delete_permission(permission_id: int, db: Session = Depends(get_db)):
@@ -121,5 +319,9 @@ def delete_permission(permission_id: int, db: Session = Depends(get_db)):
     if not db_permission:
         raise HTTPException(status_code=404, detail="Permission not found")
     db.delete(db_permission)
+    db.flush()
+    db.execute(bump_versions("permissions"))
+    log_changes(db, "permissions", ChangeOp.DELETE, [{"id": permission_id}])
     db.commit()
+    response_cache.invalidate(("permission", permission_id))
     return {"ok": True}
@@ -0,0 +1,83 @@
+from typing import Optional
+
+from db import get_db
+from fastapi import APIRouter, Depends
+from models import CloudResource, CloudTypeEnum, Developer, Permission, PermissionEnum
+from schemas import PermissionStats, StatsGroupBy
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from versions import etag_for
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+def _level_totals():
+    """total/read/write/rw counts over the grouped permissions"""
+    return (
+        func.count(Permission.id).label("total"),
+        *(
+            func.count(case((Permission.permission == level, 1))).label(level.value.lower())
+            for level in PermissionEnum
+        ),
+    )
+
+def _permissions_query(*columns, cloud_type: Optional[CloudTypeEnum] = None):
+    query = select(*columns).select_from(Permission).join(CloudResource, Permission.resource_id == CloudResource.id)
+    if cloud_type is not None:
+        query = query.where(CloudResource.cloud_type == cloud_type)
+    return query
+
+@router.get(
+    "/permissions",
+    response_model=PermissionStats,
+    dependencies=[Depends(etag_for("developers", "cloud_resources", "permissions"))],
+)
+def get_permission_stats(
+    cloud_type: Optional[CloudTypeEnum] = None,
+    group_by: Optional[StatsGroupBy] = None,
+    db: Session = Depends(get_db)
+):
+    """Count permissions by cloud type and level, per developer and per resource, with one GROUP BY each
+
+    group_by limits the response to one of the sections; the overall total is always included.
+    """
+    stats = {
+        "cloud_type": cloud_type,
+        "total": db.scalar(_permissions_query(func.count(Permission.id), cloud_type=cloud_type)),
+    }
+
+    if group_by in (None, StatsGroupBy.CLOUD_TYPE):
+        query = (
+            _permissions_query(
+                CloudResource.cloud_type, Permission.permission, func.count(Permission.id).label("count"),
+                cloud_type=cloud_type,
+            )
+            .group_by(CloudResource.cloud_type, Permission.permission)
+            .order_by(CloudResource.cloud_type, Permission.permission)
+        )
+        stats["by_cloud_type"] = [row._asdict() for row in db.execute(query)]
+
+    if group_by in (None, StatsGroupBy.DEVELOPER):
+        query = (
+            _permissions_query(
+                Developer.id.label("developer_id"), Developer.name, Developer.email, *_level_totals(),
+                cloud_type=cloud_type,
+            )
+            .join(Developer, Permission.developer_id == Developer.id)
+            .group_by(Developer.id, Developer.name, Developer.email)
+            .order_by(Developer.id)
+        )
+        stats["by_developer"] = [row._asdict() for row in db.execute(query)]
+
+    if group_by in (None, StatsGroupBy.RESOURCE):
+        query = (
+            _permissions_query(
+                CloudResource.id.label("resource_id"), CloudResource.name, CloudResource.cloud_type,
+                *_level_totals(),
+                cloud_type=cloud_type,
+            )
+            .group_by(CloudResource.id, CloudResource.name, CloudResource.cloud_type)
+            .order_by(CloudResource.id)
+        )
+        stats["by_resource"] = [row._asdict() for row in db.execute(query)]
+
+    return stats
@@ -1,5 +1,6 @@
 import enum
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, EmailStr
 
@@ -14,6 +15,21 @@ class PermissionEnum(str, enum.Enum):
     WRITE = "WRITE"
     RW = "RW"
 
+# Sort keys for list routes; a leading "-" sorts descending
+class DeveloperSort(str, enum.Enum):
+    ID = "id"
+    NAME = "name"
+    NAME_DESC = "-name"
+    EMAIL = "email"
+    EMAIL_DESC = "-email"
+
+class CloudResourceSort(str, enum.Enum):
+    ID = "id"
+    NAME = "name"
+    NAME_DESC = "-name"
+    CLOUD_TYPE = "cloud_type"
+    CLOUD_TYPE_DESC = "-cloud_type"
+
 # Base schemas without relationships to avoid circular imports
 class DeveloperBase(BaseModel):
     name: str
@@ -39,6 +55,9 @@ class CloudResourceRead(CloudResourceBase):
     class Config:
         from_attributes = True
 
+class CloudResourceMatch(CloudResourceRead):
+    score: float
+
 class PermissionBase(BaseModel):
     resource_id: int
     developer_id: int
@@ -68,3 +87,147 @@ class DeveloperWithResources(DeveloperRead):
 
 class CloudResourceWithDevelopers(CloudResourceRead):
     permissions: List[PermissionWithDeveloper] = []
+
+# Keyset-paged list responses, returned when a cursor is passed to a list route
+class DeveloperPage(BaseModel):
+    items: List[DeveloperRead]
+    next_cursor: Optional[str] = None
+
+class CloudResourcePage(BaseModel):
+    items: List[CloudResourceRead]
+    next_cursor: Optional[str] = None
+
+class PermissionPage(BaseModel):
+    items: List[PermissionRead]
+    next_cursor: Optional[str] = None
+
+# Batch get-by-ids: items in request order, plus the ids that matched nothing
+class BatchIds(BaseModel):
+    ids: List[int]
+
+class DeveloperBatch(BaseModel):
+    items: List[DeveloperRead]
+    missing_ids: List[int]
+
+class CloudResourceBatch(BaseModel):
+    items: List[CloudResourceRead]
+    missing_ids: List[int]
+
+class PermissionBatch(BaseModel):
+    items: List[PermissionRead]
+    missing_ids: List[int]
+
+# Bulk create responses: created_ids lines up with the request, null where the row failed
+class BulkRowError(BaseModel):
+    index: int
+    detail: str
+
+class BulkCreateResult(BaseModel):
+    created_ids: List[Optional[int]]
+    errors: List[BulkRowError] = []
+
+class BulkDeleteResult(BaseModel):
+    deleted_ids: List[int]
+    missing_ids: List[int]
+
+class BulkUpsertResult(BaseModel):
+    ids: List[Optional[int]]
+    errors: List[BulkRowError] = []
+
+# Permission statistics, aggregated in SQL
+class StatsGroupBy(str, enum.Enum):
+    CLOUD_TYPE = "cloud_type"
+    DEVELOPER = "developer"
+    RESOURCE = "resource"
+
+class PermissionLevelCount(BaseModel):
+    cloud_type: CloudTypeEnum
+    permission: PermissionEnum
+    count: int
+
+class PermissionLevelTotals(BaseModel):
+    total: int
+    read: int
+    write: int
+    rw: int
+
+class DeveloperPermissionTotals(PermissionLevelTotals):
+    developer_id: int
+    name: str
+    email: str
+
+class CloudResourcePermissionTotals(PermissionLevelTotals):
+    resource_id: int
+    name: str
+    cloud_type: CloudTypeEnum
+
+class PermissionStats(BaseModel):
+    """Sections not asked for with group_by are left null"""
+    cloud_type: Optional[CloudTypeEnum] = None
+    total: int
+    by_cloud_type: Optional[List[PermissionLevelCount]] = None
+    by_developer: Optional[List[DeveloperPermissionTotals]] = None
+    by_resource: Optional[List[CloudResourcePermissionTotals]] = None
+
+class HighPrivilegeDeveloper(DeveloperRead):
+    total_resources: int
+    by_cloud_type: Dict[CloudTypeEnum, int]
+    write_grants: int
+
+class HighPrivilegeDeveloperPage(BaseModel):
+    items: List[HighPrivilegeDeveloper]
+    next_cursor: Optional[str] = None
+
+# Write-access audit: WRITE/RW grants grouped by cloud and level
+class PermissionGrantGroup(BaseModel):
+    cloud_type: CloudTypeEnum
+    permission: PermissionEnum
+    grants: List[PermissionWithBoth]
+
+class WriteAccessAudit(BaseModel):
+    cloud_type: Optional[CloudTypeEnum] = None
+    total: int
+    groups: List[PermissionGrantGroup]
+
+# Developer x resource access matrix; cells hold 0 (none), 1 (READ), 2 (WRITE) or 3 (RW)
+class AccessMatrixLayout(str, enum.Enum):
+    DENSE = "dense"
+    CSR = "csr"
+
+class AccessMatrix(BaseModel):
+    cloud_type: Optional[CloudTypeEnum] = None
+    layout: AccessMatrixLayout
+    shape: List[int]
+    codes: Dict[str, int]
+    row_ids: List[int]
+    column_ids: List[int]
+    # dense: one list of cells per row
+    cells: Optional[List[List[int]]] = None
+    # csr: row r's cells are data[indptr[r]:indptr[r + 1]] in the columns indices[indptr[r]:indptr[r + 1]]
+    indptr: Optional[List[int]] = None
+    indices: Optional[List[int]] = None
+    data: Optional[List[int]] = None
+
+# Change feed: one entry per written row, in commit order
+class ChangeOp(str, enum.Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    # Upserts can't tell a create from an update; data is the row as it now reads either way
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+class ChangeLogEntryRead(BaseModel):
+    seq: int
+    table_name: str
+    op: ChangeOp
+    row_id: int
+    data: Optional[Dict] = None
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ChangePage(BaseModel):
+    items: List[ChangeLogEntryRead]
+    # Pass as since= to fetch the next page; equals since when there was nothing new
+    next_since: int
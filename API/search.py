@@ -0,0 +1,121 @@
+import heapq
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import List
+
+from models import CloudResource, TableVersion
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# pg_trgm's default similarity threshold for the % operator
+SIMILARITY_THRESHOLD = 0.3
+# Most matches one search returns; it is a top-k lookup, not a way to page through resources
+MAX_SEARCH_RESULTS = 100
+
+_WORD = re.compile(r"[^\W_]+")
+_VERSION_QUERY = select(TableVersion.version).where(TableVersion.table_name == "cloud_resources")
+_NAMES_QUERY = select(CloudResource.id, CloudResource.name, CloudResource.cloud_type)
+
+def trigrams(text: str) -> frozenset:
+    """Trigrams the way pg_trgm extracts them: lowercased words, padded with two spaces before and one after"""
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+class TrigramIndex:
+    """In-process inverted trigram index over resource names, for databases without pg_trgm
+
+    The index remembers the cloud_resources version it was built from and rebuilds when a write bumps it,
+    so every worker catches up on its next search.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            # (trigram -> resource ids, id -> (name, cloud_type, trigram count)), swapped whole on rebuild
+            self._snapshot = ({}, {})
+
+    def search(self, db: Session, q: str, limit: int) -> List[dict]:
+        version = db.scalar(_VERSION_QUERY)
+        snapshot = self._current(version)
+        if snapshot is None:
+            snapshot = self._rebuild(version, db.execute(_NAMES_QUERY))
+        return self._match(snapshot, q, limit)
+
+    async def async_search(self, db: AsyncSession, q: str, limit: int) -> List[dict]:
+        """Async counterpart of search; the queries are awaited outside the lock, which only guards the swap"""
+        version = await db.scalar(_VERSION_QUERY)
+        snapshot = self._current(version)
+        if snapshot is None:
+            snapshot = self._rebuild(version, await db.execute(_NAMES_QUERY))
+        return self._match(snapshot, q, limit)
+
+    def _current(self, version):
+        """The snapshot if it was built from this cloud_resources version, else None"""
+        with self._lock:
+            if version is None or version != self._version:
+                return None
+            return self._snapshot
+
+    def _rebuild(self, version, rows):
+        postings = defaultdict(list)
+        resources = {}
+        for resource_id, name, cloud_type in rows:
+            grams = trigrams(name)
+            resources[resource_id] = (name, cloud_type, len(grams))
+            for gram in grams:
+                postings[gram].append(resource_id)
+        with self._lock:
+            self._snapshot, self._version = (postings, resources), version
+            return self._snapshot
+
+    @staticmethod
+    def _match(snapshot, q: str, limit: int) -> List[dict]:
+        postings, resources = snapshot
+        query_grams = trigrams(q)
+        if not query_grams:
+            return []
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(postings.get(gram, ()))
+        matches = []
+        for resource_id, count in shared.items():
+            name, cloud_type, gram_count = resources[resource_id]
+            score = count / (len(query_grams) + gram_count - count)
+            if score >= SIMILARITY_THRESHOLD:
+                matches.append((score, -resource_id, name, cloud_type))
+        return [
+            {"id": -negative_id, "name": name, "cloud_type": cloud_type, "score": score}
+            for score, negative_id, name, cloud_type in heapq.nlargest(limit, matches)
+        ]
+
+resource_name_index = TrigramIndex()
+
+def _similarity_query(q: str, limit: int):
+    score = func.similarity(CloudResource.name, q).label("score")
+    return (
+        select(CloudResource.id, CloudResource.name, CloudResource.cloud_type, score)
+        .where(CloudResource.name.op("%")(q))
+        .order_by(score.desc(), CloudResource.id)
+        .limit(limit)
+    )
+
+def search_resources(db: Session, q: str, limit: int) -> List[dict]:
+    """Rank resources by trigram similarity of their name to q, best first"""
+    if db.get_bind().dialect.name != "postgresql":
+        return resource_name_index.search(db, q, limit)
+    return [row._asdict() for row in db.execute(_similarity_query(q, limit))]
+
+async def async_search_resources(db: AsyncSession, q: str, limit: int) -> List[dict]:
+    """Async counterpart of search_resources"""
+    if db.get_bind().dialect.name != "postgresql":
+        return await resource_name_index.async_search(db, q, limit)
+    return [row._asdict() for row in await db.execute(_similarity_query(q, limit))]
@@ -0,0 +1,47 @@
+from typing import Iterator
+
+import orjson
+from models import CloudResource, Developer, Permission
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+# Rows fetched per round trip from the server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+def permission_graph_query():
+    """Permissions joined with their developer and resource, as flat columns"""
+    return (
+        select(
+            Permission.id,
+            Permission.permission,
+            Developer.id.label("developer_id"),
+            Developer.name.label("developer_name"),
+            Developer.email.label("developer_email"),
+            CloudResource.id.label("resource_id"),
+            CloudResource.name.label("resource_name"),
+            CloudResource.cloud_type,
+        )
+        .join(Developer, Permission.developer_id == Developer.id)
+        .join(CloudResource, Permission.resource_id == CloudResource.id)
+    )
+
+def permission_graph_item(row) -> dict:
+    """Nest a permission_graph_query row the way PermissionWithBoth does"""
+    return {
+        "id": row.id,
+        "developer_id": row.developer_id,
+        "resource_id": row.resource_id,
+        "permission": row.permission.value,
+        "developer": {"id": row.developer_id, "name": row.developer_name, "email": row.developer_email},
+        "cloud_resource": {"id": row.resource_id, "name": row.resource_name, "cloud_type": row.cloud_type.value},
+    }
+
+def stream_ndjson(bind, query) -> Iterator[bytes]:
+    """Yield permission_graph_query rows as orjson-encoded NDJSON, one chunk per batch read from a server-side cursor
+
+    The stream outlives the request's session, so it reads through a session of its own.
+    """
+    with Session(bind) as db:
+        result = db.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        for rows in result.partitions():
+            yield b"".join(orjson.dumps(permission_graph_item(row)) + b"\n" for row in rows)
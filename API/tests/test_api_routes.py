@@ -6,18 +6,39 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+import ast
+import asyncio
+import io
+import json
 import unittest
+import zipfile
+from array import array
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, update
 from sqlalchemy.orm import sessionmaker
 
 from main import app
-from models import Base, CloudTypeEnum, PermissionEnum
+from models import Base, CloudTypeEnum, Developer, PermissionEnum
+from cache import ResponseCache, change_tags, follow_changes, response_cache
+from change_stream import ChangeBroadcaster, change_events
+from changes import log_changes
+from compression import CompressionMiddleware
 from db import get_db
+from pagination import keyset_page
+from pool_metrics import MeteredQueuePool, pool_status
+from schemas import ChangeOp
+from search import resource_name_index, trigrams
+from versions import bump_versions
 
 # Create test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+
+# Enforce foreign keys like Postgres does
+@event.listens_for(engine, "connect")
+def enable_foreign_keys(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def override_get_db():
@@ -29,6 +50,22 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+class QueryCounter:
+    """Count (and keep) the SQL statements executed against the test engine"""
+
+    def __enter__(self):
+        self.count = 0
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(engine, "before_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, *args):
+        self.count += 1
+        self.statements.append(statement)
+
 class TestEnhancedAPI(unittest.TestCase):
     
     def setUp(self):
@@ -136,6 +173,22 @@ class TestEnhancedAPI(unittest.TestCase):
         self.assertEqual(permission_data["permission"], "READ")
         permission_id = permission_data["id"]
         
+        # Test missing developer or resource maps to a 404
+        response = self.client.post("/permissions/", json={
+            "developer_id": 999,
+            "resource_id": resource_id,
+            "permission": "READ"
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["detail"], "Developer not found")
+        response = self.client.put(f"/permissions/{permission_id}", json={
+            "developer_id": developer_id,
+            "resource_id": 999,
+            "permission": "READ"
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["detail"], "CloudResource not found")
+
         # Test duplicate permission fails
         response = self.client.post("/permissions/", json={
             "developer_id": developer_id,
@@ -218,6 +271,954 @@ class TestEnhancedAPI(unittest.TestCase):
         self.assertEqual(data["name"], "S3 Bucket")
         self.assertEqual(len(data["permissions"]), 1)
 
+    def test_cursor_pagination(self):
+        """Test keyset paging walks every row exactly once"""
+        for i in range(5):
+            self.client.post("/developers/", json={
+                "name": f"Dev {i}",
+                "email": f"dev{i}@example.com"
+            })
+
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            response = self.client.get("/developers/", params={"cursor": cursor, "limit": 2})
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            seen.extend(dev["id"] for dev in page["items"])
+            cursor = page["next_cursor"]
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(seen, sorted(seen))
+
+        # Offset paging still returns a plain list
+        response = self.client.get("/developers/?skip=4&limit=2")
+        self.assertEqual([dev["id"] for dev in response.json()], seen[4:])
+
+        response = self.client.get("/permissions/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
+        # Limits outside 1..MAX_PAGE_SIZE are rejected rather than reaching SQL
+        for path in ("/developers/", "/developers/high-privilege", "/cloud_resources/", "/permissions/"):
+            for limit in (0, -1, 1001):
+                response = self.client.get(path, params={"cursor": "", "limit": limit})
+                self.assertEqual(response.status_code, 422)
+        self.assertEqual(keyset_page([object()], 0), {"items": [], "next_cursor": None})
+
+    def test_bulk_create(self):
+        """Test bulk endpoints create valid rows and report per-row errors"""
+        response = self.client.post("/developers/bulk", json=[
+            {"name": "John Doe", "email": "john@example.com"},
+            {"name": "Jane Doe", "email": "jane@example.com"},
+            {"name": "John Again", "email": "john@example.com"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        developer_ids = data["created_ids"]
+        self.assertIsNone(developer_ids[2])
+        self.assertEqual(data["errors"], [{"index": 2, "detail": "Developer with this email already exists."}])
+
+        response = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ])
+        resource_ids = response.json()["created_ids"]
+        self.assertEqual(len(resource_ids), 2)
+
+        self.client.post("/permissions/", json={
+            "developer_id": developer_ids[0],
+            "resource_id": resource_ids[0],
+            "permission": "READ"
+        })
+        response = self.client.post("/permissions/bulk", json=[
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[1], "permission": "RW"},
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[0], "permission": "WRITE"},
+            {"developer_id": 999, "resource_id": resource_ids[0], "permission": "READ"},
+            {"developer_id": developer_ids[1], "resource_id": 999, "permission": "READ"},
+            {"developer_id": developer_ids[1], "resource_id": resource_ids[0], "permission": "READ"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([created is not None for created in data["created_ids"]], [True, False, False, False, True])
+        self.assertEqual([error["detail"] for error in data["errors"]], [
+            f"Permission already exists for developer {developer_ids[0]} and resource {resource_ids[0]}",
+            "Developer not found",
+            "CloudResource not found",
+        ])
+
+        response = self.client.get(f"/permissions/{data['created_ids'][0]}")
+        self.assertEqual(response.json()["permission"], "RW")
+
+    def test_permission_upsert(self):
+        """Test upsert creates a grant, then changes its level in place"""
+        developer_id = self.client.post("/developers/", json={
+            "name": "John Doe",
+            "email": "john@example.com"
+        }).json()["id"]
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ]).json()["created_ids"]
+
+        response = self.client.put("/permissions/upsert", json={
+            "developer_id": developer_id,
+            "resource_id": resource_ids[0],
+            "permission": "READ"
+        })
+        self.assertEqual(response.status_code, 200)
+        permission_id = response.json()["id"]
+
+        response = self.client.put("/permissions/upsert", json={
+            "developer_id": developer_id,
+            "resource_id": resource_ids[0],
+            "permission": "RW"
+        })
+        self.assertEqual(response.json(), {
+            "id": permission_id,
+            "developer_id": developer_id,
+            "resource_id": resource_ids[0],
+            "permission": "RW"
+        })
+
+        response = self.client.put("/permissions/upsert", json={
+            "developer_id": 999,
+            "resource_id": resource_ids[0],
+            "permission": "RW"
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["detail"], "Developer not found")
+
+        response = self.client.put("/permissions/upsert/bulk", json=[
+            {"developer_id": developer_id, "resource_id": resource_ids[0], "permission": "WRITE"},
+            {"developer_id": developer_id, "resource_id": resource_ids[1], "permission": "READ"},
+            {"developer_id": developer_id, "resource_id": 999, "permission": "READ"},
+            {"developer_id": developer_id, "resource_id": resource_ids[1], "permission": "RW"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["ids"][0], permission_id)
+        self.assertEqual(data["ids"][1], data["ids"][3])
+        self.assertIsNone(data["ids"][2])
+        self.assertEqual(data["errors"], [{"index": 2, "detail": "CloudResource not found"}])
+
+        response = self.client.get(f"/permissions/?developer_id={developer_id}")
+        self.assertEqual([perm["permission"] for perm in response.json()], ["WRITE", "RW"])
+
+    def test_relationship_routes_use_constant_queries(self):
+        """Test detailed and by-developer/by-resource routes don't lazy load per grant"""
+        developer_ids = self.client.post("/developers/bulk", json=[
+            {"name": f"Dev {i}", "email": f"dev{i}@example.com"} for i in range(5)
+        ]).json()["created_ids"]
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": f"Bucket {i}", "cloud_type": "AWS"} for i in range(5)
+        ]).json()["created_ids"]
+        routes = [
+            f"/developers/{developer_ids[0]}/detailed",
+            f"/cloud_resources/{resource_ids[0]}/detailed",
+            f"/permissions/by-developer/{developer_ids[0]}",
+            f"/permissions/by-resource/{resource_ids[0]}",
+        ]
+
+        def count_queries():
+            counts = []
+            for route in routes:
+                with QueryCounter() as counter:
+                    self.assertEqual(self.client.get(route).status_code, 200)
+                counts.append(counter.count)
+            return counts
+
+        self.client.post("/permissions/", json={
+            "developer_id": developer_ids[0],
+            "resource_id": resource_ids[0],
+            "permission": "READ"
+        })
+        single_grant = count_queries()
+
+        self.client.post("/permissions/bulk", json=[
+            {"developer_id": developer_ids[0], "resource_id": resource_id, "permission": "RW"}
+            for resource_id in resource_ids[1:]
+        ] + [
+            {"developer_id": developer_id, "resource_id": resource_ids[0], "permission": "READ"}
+            for developer_id in developer_ids[1:]
+        ])
+        self.assertEqual(count_queries(), single_grant)
+        self.assertEqual(len(self.client.get(routes[0]).json()["permissions"]), 5)
+
+    def test_etag_revalidation(self):
+        """Test reads return a weak ETag that only changes when the tables they read are written"""
+        response = self.client.get("/developers/")
+        etag = response.headers["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        response = self.client.get("/developers/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        # A write to another table leaves the developer list valid
+        self.client.post("/cloud_resources/", json={"name": "S3 Bucket", "cloud_type": "AWS"})
+        response = self.client.get("/developers/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        developer_id = self.client.post("/developers/", json={
+            "name": "John Doe",
+            "email": "john@example.com"
+        }).json()["id"]
+        response = self.client.get("/developers/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+        # Detailed views also revalidate against the permissions table
+        detailed_etag = self.client.get(f"/developers/{developer_id}/detailed").headers["ETag"]
+        resource_id = self.client.get("/cloud_resources/").json()[0]["id"]
+        self.client.post("/permissions/", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "READ"
+        })
+        response = self.client.get(f"/developers/{developer_id}/detailed", headers={"If-None-Match": detailed_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["permissions"]), 1)
+
+        # A write that matches no row leaves the version alone
+        etag = self.client.get("/permissions/").headers["ETag"]
+        response = self.client.put("/permissions/999", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "RW"
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/permissions/", headers={"If-None-Match": etag}).status_code, 304)
+
+    def test_response_cache(self):
+        """Test cached reads are invalidated by the writes that touch them"""
+        response_cache.enabled = True
+        self.addCleanup(setattr, response_cache, "enabled", False)
+        self.addCleanup(response_cache.clear)
+        response_cache.clear()
+
+        developer_id = self.client.post("/developers/", json={
+            "name": "John Doe",
+            "email": "john@example.com"
+        }).json()["id"]
+        resource_id = self.client.post("/cloud_resources/", json={
+            "name": "S3 Bucket",
+            "cloud_type": "AWS"
+        }).json()["id"]
+        permission_id = self.client.post("/permissions/", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "READ"
+        }).json()["id"]
+
+        first = self.client.get(f"/permissions/by-developer/{developer_id}")
+        with QueryCounter() as counter:
+            second = self.client.get(f"/permissions/by-developer/{developer_id}")
+            revalidated = self.client.get(
+                f"/permissions/by-developer/{developer_id}", headers={"If-None-Match": first.headers["ETag"]}
+            )
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers["ETag"], first.headers["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(counter.count, 0)  # hits, 304 included, never reach the database
+        self.assertEqual(response_cache.stats()["hits"], 2)
+
+        # Renaming the embedded resource invalidates the developer's grant list
+        self.client.put(f"/cloud_resources/{resource_id}", json={"name": "Renamed Bucket", "cloud_type": "AWS"})
+        response = self.client.get(f"/permissions/by-developer/{developer_id}")
+        self.assertEqual(response.json()[0]["cloud_resource"]["name"], "Renamed Bucket")
+
+        self.client.put(f"/permissions/{permission_id}", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "RW"
+        })
+        response = self.client.get(f"/permissions/by-developer/{developer_id}")
+        self.assertEqual(response.json()[0]["permission"], "RW")
+
+        self.client.get(f"/developers/{developer_id}")
+        self.client.put(f"/developers/{developer_id}", json={"name": "John Updated", "email": "john@example.com"})
+        self.assertEqual(self.client.get(f"/developers/{developer_id}").json()["name"], "John Updated")
+
+        # A write through another worker never reaches this process's invalidate, only the change log
+        def write_elsewhere():
+            db = TestingSessionLocal()
+            db.execute(update(Developer).where(Developer.id == developer_id).values(name="Renamed Elsewhere"))
+            db.execute(bump_versions("developers"))
+            log_changes(db, "developers", ChangeOp.UPDATE, [{"id": developer_id, "name": "Renamed Elsewhere"}])
+            db.commit()
+            db.close()
+
+        async def follow():
+            generation = response_cache.generation()
+            follower = asyncio.create_task(follow_changes(response_cache, ChangeBroadcaster(poll_interval=0.01), engine))
+            while response_cache.generation() == generation:
+                await asyncio.sleep(0.01)
+            cached = await asyncio.to_thread(self.client.get, f"/developers/{developer_id}")
+            invalidations = response_cache.stats()["invalidations"]
+            await asyncio.to_thread(write_elsewhere)
+            while response_cache.stats()["invalidations"] == invalidations:
+                await asyncio.sleep(0.01)
+            follower.cancel()
+            return cached
+        cached = asyncio.run(asyncio.wait_for(follow(), 5))
+        response = self.client.get(f"/developers/{developer_id}")
+        self.assertEqual(response.json()["name"], "Renamed Elsewhere")
+        self.assertNotEqual(response.headers["ETag"], cached.headers["ETag"])
+        response = self.client.get(f"/developers/{developer_id}", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_response_cache_bounds(self):
+        """Test the cache evicts least recently used entries and honours the TTL and byte cap"""
+        cache = ResponseCache(enabled=True, ttl_seconds=60, max_entries=2, max_bytes=1024)
+        for key in ("a", "b"):
+            cache.store(key, dict, {"key": key}, [("tag", key)], cache.generation())
+        self.assertIsNotNone(cache.get("a"))
+        cache.store("c", dict, {"key": "c"}, [("tag", "c")], cache.generation())
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        cache.invalidate(("tag", "a"))
+        self.assertIsNone(cache.get("a"))
+
+        # Results read before an invalidation are not stored
+        generation = cache.generation()
+        cache.invalidate(("tag", "other"))
+        cache.store("d", dict, {"key": "d"}, [], generation)
+        self.assertIsNone(cache.get("d"))
+
+        cache.store("big", str, "x" * 2048, [], cache.generation())
+        self.assertIsNone(cache.get("big"))
+
+        cache.ttl_seconds = -1
+        cache.store("e", dict, {"key": "e"}, [], cache.generation())
+        self.assertIsNone(cache.get("e"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+        # Change log entries name the row, and a grant's new developer when the row still exists
+        entry = {"table_name": "permissions", "row_id": 7, "data": {"developer_id": 3, "resource_id": 1}}
+        self.assertEqual(change_tags(entry), [("permission", 7), ("developer_permissions", 3)])
+        self.assertEqual(change_tags({"table_name": "permissions", "row_id": 7, "data": None}), [("permission", 7)])
+        self.assertEqual(change_tags({"table_name": "developers", "row_id": 3, "data": None}), [("developer", 3)])
+
+    def test_export_permissions(self):
+        """Test the NDJSON export streams each grant joined with its developer and resource"""
+        developer_ids = self.client.post("/developers/bulk", json=[
+            {"name": "John Doe", "email": "john@example.com"},
+            {"name": "Jane Doe", "email": "jane@example.com"},
+        ]).json()["created_ids"]
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ]).json()["created_ids"]
+        permission_ids = self.client.post("/permissions/bulk", json=[
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[1], "permission": "RW"},
+            {"developer_id": developer_ids[1], "resource_id": resource_ids[0], "permission": "READ"},
+        ]).json()["created_ids"]
+
+        response = self.client.get("/export/permissions.ndjson")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(lines, [
+            {
+                "id": permission_ids[0],
+                "developer_id": developer_ids[0],
+                "resource_id": resource_ids[1],
+                "permission": "RW",
+                "developer": {"id": developer_ids[0], "name": "John Doe", "email": "john@example.com"},
+                "cloud_resource": {"id": resource_ids[1], "name": "BigQuery", "cloud_type": "GCP"},
+            },
+            {
+                "id": permission_ids[1],
+                "developer_id": developer_ids[1],
+                "resource_id": resource_ids[0],
+                "permission": "READ",
+                "developer": {"id": developer_ids[1], "name": "Jane Doe", "email": "jane@example.com"},
+                "cloud_resource": {"id": resource_ids[0], "name": "S3 Bucket", "cloud_type": "AWS"},
+            },
+        ])
+
+    def test_permission_stats(self):
+        """Test permission counts by cloud and level, per developer and per resource"""
+        developer_ids = self.client.post("/developers/bulk", json=[
+            {"name": "John Doe", "email": "john@example.com"},
+            {"name": "Jane Doe", "email": "jane@example.com"},
+        ]).json()["created_ids"]
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "EC2", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ]).json()["created_ids"]
+        self.client.post("/permissions/bulk", json=[
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[0], "permission": "READ"},
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[1], "permission": "RW"},
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[2], "permission": "WRITE"},
+            {"developer_id": developer_ids[1], "resource_id": resource_ids[0], "permission": "READ"},
+        ])
+
+        data = self.client.get("/stats/permissions").json()
+        self.assertEqual(data["total"], 4)
+        self.assertEqual(data["by_cloud_type"], [
+            {"cloud_type": "AWS", "permission": "READ", "count": 2},
+            {"cloud_type": "AWS", "permission": "RW", "count": 1},
+            {"cloud_type": "GCP", "permission": "WRITE", "count": 1},
+        ])
+        self.assertEqual(data["by_developer"][0], {
+            "developer_id": developer_ids[0], "name": "John Doe", "email": "john@example.com",
+            "total": 3, "read": 1, "write": 1, "rw": 1,
+        })
+        self.assertEqual(data["by_resource"][0], {
+            "resource_id": resource_ids[0], "name": "S3 Bucket", "cloud_type": "AWS",
+            "total": 2, "read": 2, "write": 0, "rw": 0,
+        })
+
+        with QueryCounter() as counter:
+            response = self.client.get("/stats/permissions", params={"cloud_type": "GCP", "group_by": "developer"})
+        data = response.json()
+        self.assertEqual(counter.count, 3)  # ETag versions, total and the one GROUP BY
+        self.assertEqual(data["total"], 1)
+        self.assertIsNone(data["by_cloud_type"])
+        self.assertIsNone(data["by_resource"])
+        self.assertEqual([row["developer_id"] for row in data["by_developer"]], [developer_ids[0]])
+
+        response = self.client.get("/stats/permissions", params={"group_by": "team"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_high_privilege_developers(self):
+        """Test the GROUP BY/HAVING threshold, its filters and keyset paging"""
+        developer_ids = self.client.post("/developers/bulk", json=[
+            {"name": "John Doe", "email": "john@example.com"},
+            {"name": "Jane Doe", "email": "jane@example.com"},
+            {"name": "Jim Doe", "email": "jim@example.com"},
+        ]).json()["created_ids"]
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "EC2", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ]).json()["created_ids"]
+        levels = {developer_ids[0]: ["READ", "RW", "WRITE"], developer_ids[1]: ["READ", "READ", "READ"]}
+        self.client.post("/permissions/bulk", json=[
+            {"developer_id": developer_id, "resource_id": resource_id, "permission": level}
+            for developer_id, developer_levels in levels.items()
+            for resource_id, level in zip(resource_ids, developer_levels)
+        ])
+
+        response = self.client.get("/developers/high-privilege", params={"min_resources": 3})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["items"][0], {
+            "id": developer_ids[0], "name": "John Doe", "email": "john@example.com",
+            "total_resources": 3, "by_cloud_type": {"AWS": 2, "AZURE": 0, "GCP": 1}, "write_grants": 2,
+        })
+        self.assertEqual([item["id"] for item in data["items"]], developer_ids[:2])
+
+        first = self.client.get("/developers/high-privilege", params={"min_resources": 1, "limit": 1}).json()
+        second = self.client.get(
+            "/developers/high-privilege", params={"min_resources": 1, "limit": 1, "cursor": first["next_cursor"]}
+        ).json()
+        self.assertEqual([item["id"] for item in first["items"] + second["items"]], developer_ids[:2])
+        self.assertIsNone(second["next_cursor"])
+
+        data = self.client.get("/developers/high-privilege", params={"min_resources": 2, "write_only": True}).json()
+        self.assertEqual([(item["id"], item["total_resources"]) for item in data["items"]], [(developer_ids[0], 2)])
+
+        data = self.client.get("/developers/high-privilege", params={"min_resources": 2, "cloud_type": "AWS"}).json()
+        self.assertEqual([item["by_cloud_type"]["GCP"] for item in data["items"]], [0, 0])
+
+    def test_write_access_audit(self):
+        """Test the audit returns only WRITE/RW grants, grouped by cloud and level, as JSON or NDJSON"""
+        developer_ids = self.client.post("/developers/bulk", json=[
+            {"name": "John Doe", "email": "john@example.com"},
+            {"name": "Jane Doe", "email": "jane@example.com"},
+        ]).json()["created_ids"]
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ]).json()["created_ids"]
+        self.client.post("/permissions/bulk", json=[
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[0], "permission": "READ"},
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[1], "permission": "RW"},
+            {"developer_id": developer_ids[1], "resource_id": resource_ids[0], "permission": "WRITE"},
+            {"developer_id": developer_ids[1], "resource_id": resource_ids[1], "permission": "WRITE"},
+        ])
+
+        data = self.client.get("/audit/write-access").json()
+        self.assertEqual(data["total"], 3)
+        self.assertEqual(
+            [(group["cloud_type"], group["permission"], len(group["grants"])) for group in data["groups"]],
+            [("AWS", "WRITE", 1), ("GCP", "RW", 1), ("GCP", "WRITE", 1)],
+        )
+        grant = data["groups"][0]["grants"][0]
+        self.assertEqual(grant["developer"]["email"], "jane@example.com")
+        self.assertEqual(grant["cloud_resource"]["name"], "S3 Bucket")
+
+        data = self.client.get("/audit/write-access", params={"cloud_type": "AWS"}).json()
+        self.assertEqual((data["cloud_type"], data["total"]), ("AWS", 1))
+
+        response = self.client.get("/audit/write-access.ndjson", params={"cloud_type": "GCP"})
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([line["permission"] for line in lines], ["RW", "WRITE"])
+
+    def test_access_matrix(self):
+        """Test the access matrix in CSR and dense layouts, as JSON and as .npz"""
+        for layout in ("dense", "csr"):
+            data = self.client.get("/access-matrix", params={"layout": layout}).json()
+            self.assertEqual((data["shape"], data["row_ids"], data["column_ids"]), ([0, 0], [], []))
+        self.assertEqual(self.client.get("/access-matrix", params={"layout": "dense"}).json()["cells"], [])
+        self.assertEqual(self.client.get("/access-matrix.npz", params={"layout": "dense"}).status_code, 200)
+
+        developer_ids = self.client.post("/developers/bulk", json=[
+            {"name": "John Doe", "email": "john@example.com"},
+            {"name": "Jane Doe", "email": "jane@example.com"},
+            {"name": "No Grants", "email": "none@example.com"},
+        ]).json()["created_ids"]
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "EC2", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ]).json()["created_ids"]
+        self.client.post("/permissions/bulk", json=[
+            {"developer_id": developer_ids[1], "resource_id": resource_ids[2], "permission": "WRITE"},
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[1], "permission": "RW"},
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[0], "permission": "READ"},
+        ])
+
+        with QueryCounter() as counter:
+            data = self.client.get("/access-matrix").json()
+        self.assertEqual(counter.count, 2)  # ETag versions and the permissions scan
+        self.assertEqual(data["shape"], [2, 3])
+        self.assertEqual(data["codes"], {"READ": 1, "WRITE": 2, "RW": 3})
+        self.assertEqual(data["row_ids"], developer_ids[:2])
+        self.assertEqual(data["column_ids"], resource_ids)
+        self.assertEqual((data["indptr"], data["indices"], data["data"]), ([0, 2, 3], [0, 1, 2], [1, 3, 2]))
+        self.assertNotIn("cells", data)
+
+        data = self.client.get("/access-matrix", params={"layout": "dense"}).json()
+        self.assertEqual(data["cells"], [[1, 3, 0], [0, 0, 2]])
+        data = self.client.get("/access-matrix", params={"layout": "dense", "cloud_type": "GCP"}).json()
+        self.assertEqual((data["row_ids"], data["column_ids"], data["cells"]), ([developer_ids[1]], resource_ids[2:], [[2]]))
+
+        response = self.client.get("/access-matrix.npz", params={"layout": "dense"})
+        self.assertEqual(response.status_code, 200)
+        arrays = {}
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            for name in archive.namelist():
+                raw = archive.read(name)
+                self.assertEqual(raw[:8], b"\x93NUMPY\x01\x00")
+                header_end = 10 + int.from_bytes(raw[8:10], "little")
+                self.assertEqual(header_end % 64, 0)
+                header = ast.literal_eval(raw[10:header_end].decode("latin1"))
+                values = array("B" if header["descr"] == "|u1" else "i", raw[header_end:])
+                arrays[name] = (header["shape"], values.tolist())
+        self.assertEqual(arrays["row_ids.npy"], ((2,), developer_ids[:2]))
+        self.assertEqual(arrays["cells.npy"], ((2, 3), [1, 3, 0, 0, 0, 2]))
+
+        response = self.client.get("/access-matrix.npz")
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                ["column_ids.npy", "data.npy", "indices.npy", "indptr.npy", "row_ids.npy"],
+            )
+
+    def test_change_feed(self):
+        """Test every write lands in the change log and /changes pages through it by sequence number"""
+        developer_id = self.client.post("/developers/", json={"name": "John Doe", "email": "john@example.com"}).json()["id"]
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ]).json()["created_ids"]
+        permission_id = self.client.post("/permissions/", json={
+            "developer_id": developer_id, "resource_id": resource_ids[0], "permission": "READ"
+        }).json()["id"]
+        self.client.put("/permissions/upsert", json={
+            "developer_id": developer_id, "resource_id": resource_ids[0], "permission": "RW"
+        })
+        self.client.put(f"/developers/{developer_id}", json={"name": "John Smith", "email": "john@example.com"})
+        self.client.delete(f"/permissions/{permission_id}")
+        self.client.delete(f"/cloud_resources/{resource_ids[1]}")
+
+        response = self.client.get("/changes")
+        data = response.json()
+        self.assertEqual(
+            [(item["table_name"], item["op"], item["row_id"]) for item in data["items"]],
+            [
+                ("developers", "create", developer_id),
+                ("cloud_resources", "create", resource_ids[0]),
+                ("cloud_resources", "create", resource_ids[1]),
+                ("permissions", "create", permission_id),
+                ("permissions", "upsert", permission_id),
+                ("developers", "update", developer_id),
+                ("permissions", "delete", permission_id),
+                ("cloud_resources", "delete", resource_ids[1]),
+            ],
+        )
+        seqs = [item["seq"] for item in data["items"]]
+        self.assertEqual(seqs, sorted(seqs))
+        self.assertEqual(data["next_since"], seqs[-1])
+        self.assertEqual(data["items"][1]["data"], {"id": resource_ids[0], "name": "S3 Bucket", "cloud_type": "AWS"})
+        self.assertEqual(data["items"][4]["data"]["permission"], "RW")
+        self.assertIsNone(data["items"][6]["data"])
+
+        page = self.client.get("/changes", params={"since": seqs[2], "limit": 2}).json()
+        self.assertEqual([item["seq"] for item in page["items"]], seqs[3:5])
+        for limit in (0, -1, 1001):
+            self.assertEqual(self.client.get("/changes", params={"limit": limit}).status_code, 422)
+        self.assertEqual(page["next_since"], seqs[4])
+        page = self.client.get("/changes", params={"since": seqs[-1]}).json()
+        self.assertEqual(page, {"items": [], "next_since": seqs[-1]})
+
+        # A failed write leaves no entry behind
+        self.client.post("/developers/", json={"name": "Dup", "email": "john@example.com"})
+        response = self.client.get("/changes", params={"since": seqs[-1]}, headers={"If-None-Match": response.headers["etag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_stream(self):
+        """Test the change stream catches up after Last-Event-ID, follows live writes and drops slow consumers"""
+        self.client.post("/developers/", json={"name": "John Doe", "email": "john@example.com"})
+        first_seq = self.client.get("/changes").json()["next_since"]
+
+        def parse(event):
+            id_line, data_line = event.decode().strip().split("\n")
+            return int(id_line[len("id: "):]), json.loads(data_line[len("data: "):])
+
+        async def follow():
+            broadcaster = ChangeBroadcaster(poll_interval=0.01)
+            events = change_events(broadcaster, engine, last_seq=first_seq - 1)
+            caught_up = await anext(events)
+            await asyncio.to_thread(self.client.post, "/developers/", json={"name": "Jane", "email": "jane@example.com"})
+            live = await asyncio.wait_for(anext(events), 5)
+            await events.aclose()
+            return parse(caught_up), parse(live), broadcaster
+
+        (caught_up_seq, caught_up), (live_seq, live), broadcaster = asyncio.run(follow())
+        self.assertEqual((caught_up_seq, caught_up["op"], caught_up["data"]["name"]), (first_seq, "create", "John Doe"))
+        self.assertEqual(live_seq, first_seq + 1)
+        self.assertEqual(live["data"]["email"], "jane@example.com")
+        self.assertIsNone(broadcaster._task)
+
+        async def fall_behind():
+            broadcaster = ChangeBroadcaster(poll_interval=0.01, buffer_size=1)
+            events = change_events(broadcaster, engine)
+            pending = asyncio.ensure_future(anext(events))
+            await asyncio.sleep(0.05)
+            await asyncio.to_thread(self.client.post, "/developers/bulk", json=[
+                {"name": f"Dev {i}", "email": f"dev{i}@example.com"} for i in range(3)
+            ])
+            with self.assertRaises(StopAsyncIteration):
+                await asyncio.wait_for(pending, 5)
+            return broadcaster
+
+        broadcaster = asyncio.run(fall_behind())
+        self.assertEqual(broadcaster._subscribers, set())
+
+        response = self.client.get("/changes/stream", headers={"Last-Event-ID": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cascading_deletes(self):
+        """Test deleting developers or resources removes their grants in the database and logs each one"""
+        developer_ids = self.client.post("/developers/bulk", json=[
+            {"name": "John Doe", "email": "john@example.com"},
+            {"name": "Jane Doe", "email": "jane@example.com"},
+        ]).json()["created_ids"]
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ]).json()["created_ids"]
+        permission_ids = self.client.post("/permissions/bulk", json=[
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[0], "permission": "READ"},
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[1], "permission": "RW"},
+            {"developer_id": developer_ids[1], "resource_id": resource_ids[0], "permission": "WRITE"},
+        ]).json()["created_ids"]
+        since = self.client.get("/changes").json()["next_since"]
+        missing_id = developer_ids[-1] + 100
+
+        ids = f"{developer_ids[0]},{missing_id},{developer_ids[0]}"
+        with QueryCounter() as counter:
+            response = self.client.delete("/developers/", params={"ids": ids})
+        self.assertEqual(response.json(), {"deleted_ids": [developer_ids[0]], "missing_ids": [missing_id]})
+        # No statement reads the grants back; they are deleted set-based, after locking their developers
+        self.assertFalse(any(
+            statement.lstrip().startswith("SELECT") and "permissions" in statement for statement in counter.statements
+        ))
+        self.assertTrue(any(statement.lstrip().startswith("DELETE FROM permissions") for statement in counter.statements))
+        self.assertEqual([p["id"] for p in self.client.get("/permissions/").json()], [permission_ids[2]])
+
+        self.assertEqual(self.client.delete(f"/cloud_resources/{resource_ids[0]}").json(), {"ok": True})
+        self.assertEqual(self.client.get("/permissions/").json(), [])
+
+        # Deletes that remove nothing, or cascade to nothing, leave the untouched tables' ETags alone
+        developers_etag = self.client.get("/developers/").headers["ETag"]
+        permissions_etag = self.client.get("/permissions/").headers["ETag"]
+        response = self.client.delete("/developers/", params={"ids": f"{missing_id},{missing_id + 1}"})
+        self.assertEqual(response.json(), {"deleted_ids": [], "missing_ids": [missing_id, missing_id + 1]})
+        self.assertEqual(self.client.get("/developers/").headers["ETag"], developers_etag)
+        self.assertEqual(self.client.delete(f"/developers/{developer_ids[1]}").json(), {"ok": True})
+        self.assertNotEqual(self.client.get("/developers/").headers["ETag"], developers_etag)
+        self.assertEqual(self.client.get("/permissions/").headers["ETag"], permissions_etag)
+
+        changes = self.client.get("/changes", params={"since": since}).json()["items"]
+        self.assertEqual([(item["table_name"], item["op"], item["row_id"]) for item in changes], [
+            ("permissions", "delete", permission_ids[0]),
+            ("permissions", "delete", permission_ids[1]),
+            ("developers", "delete", developer_ids[0]),
+            ("permissions", "delete", permission_ids[2]),
+            ("cloud_resources", "delete", resource_ids[0]),
+            ("developers", "delete", developer_ids[1]),
+        ])
+
+    def test_list_filters_and_sort(self):
+        """Test list routes filter and sort in SQL"""
+        self.client.post("/developers/bulk", json=[
+            {"name": "John Doe", "email": "john@example.com"},
+            {"name": "Alice Smith", "email": "alice@example.com"},
+            {"name": "alice smith", "email": "alice2@example.com"},
+        ])
+        self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "S3_Archive", "cloud_type": "AWS"},
+            {"name": "SQL Server", "cloud_type": "AZURE"},
+            {"name": "Sheets", "cloud_type": "GCP"},
+        ])
+
+        response = self.client.get("/developers/", params={"name": "ALICE SMITH"})
+        self.assertEqual([dev["email"] for dev in response.json()], ["alice@example.com", "alice2@example.com"])
+        response = self.client.get("/developers/", params={"email": "john@example.com"})
+        self.assertEqual([dev["name"] for dev in response.json()], ["John Doe"])
+        response = self.client.get("/developers/", params={"sort": "-email"})
+        self.assertEqual([dev["email"] for dev in response.json()][0], "john@example.com")
+
+        response = self.client.get("/cloud_resources/", params={"cloud_type": "AWS"})
+        self.assertEqual([r["name"] for r in response.json()], ["S3 Bucket", "S3_Archive"])
+        # Prefixes are matched literally, LIKE wildcards included
+        response = self.client.get("/cloud_resources/", params={"name_prefix": "S3_"})
+        self.assertEqual([r["name"] for r in response.json()], ["S3_Archive"])
+        response = self.client.get("/cloud_resources/", params={"name_prefix": "S", "sort": "-name"})
+        self.assertEqual([r["name"] for r in response.json()], ["Sheets", "SQL Server", "S3_Archive", "S3 Bucket"])
+        response = self.client.get("/cloud_resources/", params={"cloud_type": "AWS", "cursor": ""})
+        self.assertEqual(len(response.json()["items"]), 2)
+
+        response = self.client.get("/cloud_resources/", params={"sort": "name", "cursor": ""})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/cloud_resources/", params={"sort": "size"})
+        self.assertEqual(response.status_code, 422)
+
+    def test_developer_lookup(self):
+        """Test resolving developers by email or name"""
+        developer_ids = self.client.post("/developers/bulk", json=[
+            {"name": "Alice Smith", "email": "alice@example.com"},
+            {"name": "alice smith", "email": "alice2@example.com"},
+            {"name": "John Doe", "email": "john@example.com"},
+        ]).json()["created_ids"]
+
+        response = self.client.get("/developers/lookup", params={"email": "john@example.com"})
+        self.assertEqual(response.json(), [{"id": developer_ids[2], "name": "John Doe", "email": "john@example.com"}])
+
+        response = self.client.get("/developers/lookup", params={"name": "ALICE SMITH"})
+        self.assertEqual([dev["id"] for dev in response.json()], developer_ids[:2])
+
+        response = self.client.get("/developers/lookup", params={"name": "Nobody"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/developers/lookup").status_code, 400)
+        response = self.client.get("/developers/lookup", params={"name": "John Doe", "email": "john@example.com"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_get_by_ids(self):
+        """Test batch reads return rows in request order and report missing ids"""
+        developer_ids = self.client.post("/developers/bulk", json=[
+            {"name": "Alice", "email": "alice@example.com"},
+            {"name": "Bob", "email": "bob@example.com"},
+        ]).json()["created_ids"]
+        missing_id = developer_ids[-1] + 100
+
+        ids = f"{developer_ids[1]},{missing_id},{developer_ids[0]},{developer_ids[1]}"
+        response = self.client.get("/developers/batch", params={"ids": ids})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([dev["id"] for dev in data["items"]], [developer_ids[1], developer_ids[0]])
+        self.assertEqual(data["items"][0], {"id": developer_ids[1], "name": "Bob", "email": "bob@example.com"})
+        self.assertEqual(data["missing_ids"], [missing_id])
+
+        resource_id = self.client.post("/cloud_resources/", json={"name": "S3 Bucket", "cloud_type": "AWS"}).json()["id"]
+        permission_id = self.client.post("/permissions/", json={
+            "developer_id": developer_ids[0], "resource_id": resource_id, "permission": "READ"
+        }).json()["id"]
+        response = self.client.post("/permissions/batch", json={"ids": [permission_id, missing_id]})
+        self.assertEqual(response.json()["items"][0]["resource_id"], resource_id)
+        self.assertEqual(response.json()["missing_ids"], [missing_id])
+        response = self.client.get("/cloud_resources/batch", params={"ids": str(resource_id)})
+        self.assertEqual(response.json()["items"][0]["name"], "S3 Bucket")
+
+        self.assertEqual(self.client.get("/developers/batch", params={"ids": "1,x"}).status_code, 400)
+        too_many = ",".join(str(i) for i in range(1, 1002))
+        self.assertEqual(self.client.get("/developers/batch", params={"ids": too_many}).status_code, 400)
+
+    def test_resource_search(self):
+        """Test fuzzy resource search ranks close names first and sees new resources"""
+        resource_name_index.clear()
+        self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "S3 Bucket Logs", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ])
+        self.assertEqual(trigrams("S3"), {"  s", " s3", "s3 "})
+
+        response = self.client.get("/cloud_resources/search", params={"q": "s3 bukcet"})
+        self.assertEqual(response.status_code, 200)
+        matches = response.json()
+        self.assertEqual([match["name"] for match in matches], ["S3 Bucket", "S3 Bucket Logs"])
+        self.assertGreater(matches[0]["score"], matches[1]["score"])
+
+        response = self.client.get("/cloud_resources/search", params={"q": "s3 bucket", "limit": 1})
+        self.assertEqual([match["name"] for match in response.json()], ["S3 Bucket"])
+
+        self.client.post("/cloud_resources/", json={"name": "Big Table", "cloud_type": "GCP"})
+        response = self.client.get("/cloud_resources/search", params={"q": "big table"})
+        self.assertEqual(response.json()[0]["name"], "Big Table")
+
+        self.assertEqual(self.client.get("/cloud_resources/search", params={"q": "zzzz"}).json(), [])
+        self.assertEqual(self.client.get("/cloud_resources/search", params={"q": ""}).status_code, 422)
+        for limit in (0, -1, 101):
+            response = self.client.get("/cloud_resources/search", params={"q": "s3", "limit": limit})
+            self.assertEqual(response.status_code, 422)
+
+    def test_list_routes_fast_json(self):
+        """Test list routes serialize column rows directly while documenting the same response models"""
+        developer_id = self.client.post("/developers/", json={
+            "name": "John Doe",
+            "email": "john@example.com"
+        }).json()["id"]
+        resource_id = self.client.post("/cloud_resources/", json={
+            "name": "S3 Bucket",
+            "cloud_type": "AWS"
+        }).json()["id"]
+        permission_id = self.client.post("/permissions/", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "READ"
+        }).json()["id"]
+
+        response = self.client.get("/permissions/")
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertEqual(response.json(), [
+            {"resource_id": resource_id, "developer_id": developer_id, "permission": "READ", "id": permission_id}
+        ])
+        response = self.client.get("/cloud_resources/", params={"cursor": ""})
+        self.assertEqual(response.json(), {
+            "items": [{"name": "S3 Bucket", "cloud_type": "AWS", "id": resource_id}],
+            "next_cursor": None,
+        })
+
+        paths = app.openapi()["paths"]
+        models = {"/developers/": "Developer", "/cloud_resources/": "CloudResource", "/permissions/": "Permission"}
+        for path, model in models.items():
+            schema = paths[path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+            self.assertEqual(schema["anyOf"], [
+                {"type": "array", "items": {"$ref": f"#/components/schemas/{model}Read"}},
+                {"$ref": f"#/components/schemas/{model}Page"},
+            ])
+
+    def test_sparse_fieldsets(self):
+        """Test fields= narrows both the SELECT and the response of list and detailed routes"""
+        developer_id = self.client.post("/developers/", json={
+            "name": "John Doe",
+            "email": "john@example.com"
+        }).json()["id"]
+        resource_id = self.client.post("/cloud_resources/", json={
+            "name": "S3 Bucket",
+            "cloud_type": "AWS"
+        }).json()["id"]
+        permission_id = self.client.post("/permissions/", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "READ"
+        }).json()["id"]
+
+        with QueryCounter() as counter:
+            response = self.client.get("/developers/", params={"fields": "name"})
+        self.assertEqual(response.json(), [{"id": developer_id, "name": "John Doe"}])
+        self.assertNotIn("email", counter.statements[-1])
+
+        response = self.client.get("/cloud_resources/", params={"fields": "cloud_type", "cursor": ""})
+        self.assertEqual(response.json()["items"], [{"cloud_type": "AWS", "id": resource_id}])
+        response = self.client.get("/permissions/", params={"fields": "permission,developer_id"})
+        self.assertEqual(response.json(), [{"developer_id": developer_id, "permission": "READ", "id": permission_id}])
+
+        # Leaving permissions out skips loading the grants altogether
+        with QueryCounter() as counter:
+            response = self.client.get(f"/developers/{developer_id}/detailed", params={"fields": "email"})
+        self.assertEqual(response.json(), {"id": developer_id, "email": "john@example.com"})
+        self.assertFalse(any("permissions" in statement for statement in counter.statements))
+
+        response = self.client.get(f"/cloud_resources/{resource_id}/detailed", params={"fields": "name,permissions"})
+        data = response.json()
+        self.assertEqual(set(data), {"id", "name", "permissions"})
+        self.assertEqual(data["permissions"][0]["developer"]["email"], "john@example.com")
+
+        response = self.client.get("/developers/", params={"fields": "name,salary"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "Unknown field(s): salary")
+
+    def test_response_compression(self):
+        """Test large responses are compressed with brotli or gzip and small ones are left alone"""
+        self.client.post("/developers/bulk", json=[
+            {"name": f"Developer {i}", "email": f"developer{i}@example.com"} for i in range(50)
+        ])
+
+        response = self.client.get("/developers/", headers={"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.headers["content-encoding"], "br")
+        self.assertEqual(len(response.json()), 50)
+        response = self.client.get("/developers/", headers={"Accept-Encoding": "gzip, br;q=0"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(len(response.json()), 50)
+
+        response = self.client.get("/developers/", params={"limit": 1}, headers={"Accept-Encoding": "gzip, br"})
+        self.assertNotIn("content-encoding", response.headers)
+
+        # A streamed body is one brotli stream; chunks at or over thread_minimum_size go through a worker thread
+        def streaming_app(media_type):
+            async def asgi(scope, receive, send):
+                headers = [(b"content-type", media_type.encode())]
+                await send({"type": "http.response.start", "status": 200, "headers": headers})
+                await send({"type": "http.response.body", "body": b"ab", "more_body": True})
+                await send({"type": "http.response.body", "body": b"cdefgh"})
+            return CompressionMiddleware(asgi, minimum_size=0, thread_minimum_size=4)
+
+        response = TestClient(streaming_app("text/plain")).get("/", headers={"Accept-Encoding": "br"})
+        self.assertEqual(response.headers["content-encoding"], "br")
+        self.assertNotIn("content-length", response.headers)
+        self.assertEqual(response.content, b"abcdefgh")
+
+        response = TestClient(streaming_app("text/event-stream")).get("/", headers={"Accept-Encoding": "br"})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.content, b"abcdefgh")
+
+    def test_health_checks(self):
+        """Test liveness answers without the database and readiness checks it"""
+        self.assertEqual(self.client.get("/health/live").json(), {"status": "ok"})
+        with QueryCounter() as counter:
+            response = self.client.get("/health/ready")
+        self.assertEqual(response.json(), {"status": "ok", "database": "ok"})
+        self.assertEqual(counter.statements, ["SELECT 1"])
+
+    def test_pool_status(self):
+        """Test pool metrics report occupancy and checkout times"""
+        response = self.client.get("/internal/pool")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        for key in ("pool_size", "checked_out", "idle", "overflow", "max_overflow", "checkout_time_ms"):
+            self.assertIn(key, data["sync"])
+        self.assertEqual(data["sync"]["checkout_time_ms"]["buckets"][-1]["le"], "+Inf")
+
+        # Checkouts through a metered pool land in the histogram
+        metered_engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=MeteredQueuePool)
+        with metered_engine.connect():
+            self.assertEqual(pool_status(metered_engine.pool, 10)["checked_out"], 1)
+        status = pool_status(metered_engine.pool, 10)
+        self.assertEqual(status["checkout_time_ms"]["count"], 1)
+        self.assertEqual(status["max_overflow"], 10)
+        self.assertEqual(status["idle"], 1)
+        metered_engine.dispose()
+
 
 if __name__ == "__main__":
     unittest.main()
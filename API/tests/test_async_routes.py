@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test script for the async route handlers
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import asyncio
+import unittest
+from fastapi import APIRouter, FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from main import with_async_routes
+from models import Base, ChangeLogEntry
+from search import resource_name_index
+from db import get_async_db
+from routes.cloud_resource.async_routes import router as async_cloud_resource_router
+from routes.cloud_resource.routes import router as cloud_resource_router
+from routes.developer.async_routes import router as async_developer_router
+from routes.developer.routes import router as developer_router
+from routes.permission.async_routes import router as async_permission_router
+from routes.permission.routes import router as permission_router
+
+# Create test database; each TestClient request runs on its own event loop, so don't pool connections
+engine = create_engine("sqlite:///./test_async.db", connect_args={"check_same_thread": False})
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_async.db", poolclass=NullPool)
+
+# Enforce foreign keys like Postgres does
+@event.listens_for(async_engine.sync_engine, "connect")
+def enable_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app = FastAPI()
+app.include_router(with_async_routes(developer_router, async_developer_router))
+app.include_router(with_async_routes(cloud_resource_router, async_cloud_resource_router))
+app.include_router(with_async_routes(permission_router, async_permission_router))
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+class TestAsyncAPI(unittest.TestCase):
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        Base.metadata.drop_all(bind=engine)
+
+    def test_async_routes_replace_sync_handlers(self):
+        """Test that every route is served by an async handler"""
+        for route in app.routes:
+            if isinstance(route, APIRoute):
+                self.assertTrue(asyncio.iscoroutinefunction(route.endpoint), route.path)
+
+    def test_with_async_routes_rejects_sync_only_routes(self):
+        """Test that a sync handler without an async version fails at startup instead of using the sync engine"""
+        sync_router = APIRouter()
+
+        @sync_router.get("/items")
+        def list_items():
+            return []
+
+        with self.assertRaises(RuntimeError) as raised:
+            with_async_routes(sync_router, APIRouter())
+        self.assertIn("GET /items", str(raised.exception))
+
+    def test_permission_flow(self):
+        """Test creating and reading permissions through the async handlers"""
+        developer_id = self.client.post("/developers/", json={
+            "name": "John Doe",
+            "email": "john@example.com"
+        }).json()["id"]
+        resource_id = self.client.post("/cloud_resources/", json={
+            "name": "S3 Bucket",
+            "cloud_type": "AWS"
+        }).json()["id"]
+
+        response = self.client.post("/permissions/", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "READ"
+        })
+        self.assertEqual(response.status_code, 200)
+        permission_id = response.json()["id"]
+
+        # Missing parents and duplicates still map to the same errors
+        response = self.client.post("/permissions/", json={
+            "developer_id": developer_id,
+            "resource_id": 999,
+            "permission": "READ"
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["detail"], "CloudResource not found")
+
+        response = self.client.post("/permissions/", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "WRITE"
+        })
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.put(f"/permissions/{permission_id}", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "RW"
+        })
+        self.assertEqual(response.json()["permission"], "RW")
+
+        etag = self.client.get("/permissions/").headers["ETag"]
+        response = self.client.put("/permissions/999", json={
+            "developer_id": developer_id,
+            "resource_id": resource_id,
+            "permission": "READ"
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/permissions/", headers={"If-None-Match": etag}).status_code, 304)
+
+        response = self.client.get(f"/developers/{developer_id}/detailed")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["permissions"][0]["cloud_resource"]["name"], "S3 Bucket")
+
+        response = self.client.get(f"/permissions/by-resource/{resource_id}")
+        self.assertEqual(response.json()[0]["developer"]["email"], "john@example.com")
+
+        response = self.client.delete(f"/permissions/{permission_id}")
+        self.assertEqual(response.json()["ok"], True)
+        self.assertEqual(self.client.get(f"/permissions/{permission_id}").status_code, 404)
+
+    def test_list_filters(self):
+        """Test list filters and sorting through the async handlers"""
+        for name, email in (("John Doe", "john@example.com"), ("Alice Smith", "alice@example.com")):
+            self.client.post("/developers/", json={"name": name, "email": email})
+        for name, cloud_type in (("S3 Bucket", "AWS"), ("BigQuery", "GCP"), ("S3 Archive", "AWS")):
+            self.client.post("/cloud_resources/", json={"name": name, "cloud_type": cloud_type})
+
+        response = self.client.get("/developers/", params={"name": "alice smith"})
+        self.assertEqual([dev["email"] for dev in response.json()], ["alice@example.com"])
+
+        response = self.client.get("/cloud_resources/", params={"cloud_type": "AWS", "sort": "name"})
+        self.assertEqual([r["name"] for r in response.json()], ["S3 Archive", "S3 Bucket"])
+        response = self.client.get("/cloud_resources/", params={"name_prefix": "Big"})
+        self.assertEqual([r["name"] for r in response.json()], ["BigQuery"])
+
+    def test_writes_are_logged(self):
+        """Test the async write handlers append to the change log"""
+        developer_id = self.client.post("/developers/", json={"name": "John Doe", "email": "john@example.com"}).json()["id"]
+        self.client.put(f"/developers/{developer_id}", json={"name": "John Smith", "email": "john@example.com"})
+        self.client.delete(f"/developers/{developer_id}")
+
+        with engine.connect() as connection:
+            rows = connection.execute(
+                select(ChangeLogEntry.op, ChangeLogEntry.row_id, ChangeLogEntry.data).order_by(ChangeLogEntry.seq)
+            ).all()
+        self.assertEqual([(op, row_id) for op, row_id, _ in rows], [
+            ("create", developer_id), ("update", developer_id), ("delete", developer_id),
+        ])
+        self.assertEqual(rows[1].data, {"id": developer_id, "name": "John Smith", "email": "john@example.com"})
+
+    def test_bulk_and_batch_routes(self):
+        """Test the bulk, batch, lookup and upsert handlers through their async versions"""
+        response = self.client.post("/developers/bulk", json=[
+            {"name": "John Doe", "email": "john@example.com"},
+            {"name": "Alice Smith", "email": "alice@example.com"},
+            {"name": "Dup", "email": "john@example.com"},
+        ])
+        developer_ids = response.json()["created_ids"]
+        self.assertIsNone(developer_ids[2])
+        self.assertEqual(response.json()["errors"][0]["index"], 2)
+        resource_ids = self.client.post("/cloud_resources/bulk", json=[
+            {"name": "S3 Bucket", "cloud_type": "AWS"},
+            {"name": "BigQuery", "cloud_type": "GCP"},
+        ]).json()["created_ids"]
+
+        response = self.client.post("/permissions/bulk", json=[
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[0], "permission": "READ"},
+            {"developer_id": developer_ids[0], "resource_id": 999, "permission": "READ"},
+        ])
+        self.assertEqual(response.json()["errors"], [{"index": 1, "detail": "CloudResource not found"}])
+        response = self.client.put("/permissions/upsert", json={
+            "developer_id": developer_ids[0], "resource_id": resource_ids[0], "permission": "RW"
+        })
+        self.assertEqual(response.json()["permission"], "RW")
+        response = self.client.put("/permissions/upsert/bulk", json=[
+            {"developer_id": developer_ids[0], "resource_id": resource_ids[1], "permission": "WRITE"},
+            {"developer_id": 999, "resource_id": resource_ids[1], "permission": "READ"},
+        ])
+        self.assertEqual(response.json()["errors"], [{"index": 1, "detail": "Developer not found"}])
+
+        response = self.client.get("/developers/batch", params={"ids": f"{developer_ids[1]},999,{developer_ids[0]}"})
+        self.assertEqual([dev["id"] for dev in response.json()["items"]], [developer_ids[1], developer_ids[0]])
+        self.assertEqual(response.json()["missing_ids"], [999])
+        response = self.client.post("/cloud_resources/batch", json={"ids": resource_ids})
+        self.assertEqual([resource["name"] for resource in response.json()["items"]], ["S3 Bucket", "BigQuery"])
+        response = self.client.get("/permissions/batch", params={"ids": "999"})
+        self.assertEqual(response.json(), {"items": [], "missing_ids": [999]})
+
+        response = self.client.get("/developers/lookup", params={"name": "ALICE SMITH"})
+        self.assertEqual([dev["id"] for dev in response.json()], [developer_ids[1]])
+        response = self.client.get("/developers/high-privilege", params={"min_resources": 2})
+        self.assertEqual(response.json()["items"][0]["by_cloud_type"]["GCP"], 1)
+        self.assertEqual(response.json()["items"][0]["write_grants"], 2)
+
+        resource_name_index.clear()
+        response = self.client.get("/cloud_resources/search", params={"q": "bigquery"})
+        self.assertEqual([match["id"] for match in response.json()], [resource_ids[1]])
+
+        response = self.client.delete("/developers/", params={"ids": f"{developer_ids[0]},999"})
+        self.assertEqual(response.json(), {"deleted_ids": [developer_ids[0]], "missing_ids": [999]})
+        self.assertEqual(self.client.get("/permissions/").json(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test script for the schema migrations
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import unittest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+
+from migrate import BASELINE_REVISION, alembic_config, migrate
+from models import Base
+
+DATABASE_PATH = "./test_migrations.db"
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine(DATABASE_URL)
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(DATABASE_PATH)
+
+    def current_revision(self):
+        with self.engine.connect() as connection:
+            return MigrationContext.configure(connection).get_current_revision()
+
+    def test_migrations_match_models(self):
+        """Test upgrading an empty database yields the schema the models describe"""
+        migrate(DATABASE_URL)
+        with self.engine.connect() as connection:
+            diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+        # The trigram index is Postgres-only, which autogenerate does not account for
+        diff = [change for change in diff if getattr(change[1], "name", None) != "ix_cloud_resources_name_trgm"]
+        self.assertEqual(diff, [])
+
+        with self.engine.connect() as connection:
+            versions = dict(connection.execute(text("SELECT table_name, version FROM table_versions")).all())
+        self.assertEqual(versions, {"developers": 0, "cloud_resources": 0, "permissions": 0, "change_log": 0})
+
+        indexes = {index["name"] for index in inspect(self.engine).get_indexes("permissions")}
+        self.assertIn("ix_permissions_resource_id_permission", indexes)
+        self.assertIn("ix_permissions_developer_id_permission", indexes)
+
+    def test_adopts_schema_built_before_migrations(self):
+        """Test a database created without migrations is stamped at the baseline and upgraded in place"""
+        config = alembic_config(DATABASE_URL)
+        command.upgrade(config, BASELINE_REVISION)
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO developers (name, email) VALUES ('John Doe', 'john@example.com')"))
+            connection.execute(text("DROP TABLE alembic_version"))
+
+        migrate(DATABASE_URL)
+        self.assertEqual(self.current_revision(), "0005")
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT count(*) FROM developers")).scalar(), 1)
+
+    def test_downgrade_to_base(self):
+        """Test every migration can be reverted"""
+        migrate(DATABASE_URL)
+        command.downgrade(alembic_config(DATABASE_URL), "base")
+        self.assertEqual(set(inspect(self.engine).get_table_names()), {"alembic_version"})
+
+
+if __name__ == "__main__":
+    unittest.main()
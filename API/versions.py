@@ -0,0 +1,68 @@
+from typing import Optional
+
+from db import get_async_db, get_db
+from fastapi import Depends, HTTPException, Request, Response
+from models import TableVersion
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+def bump_versions(*tables):
+    """UPDATE that bumps the given tables' versions; run it in the same transaction as the write, just before commit
+
+    A version row stays locked from its bump until commit, so every write bumps last: after all of its inserts,
+    updates and deletes, the version rows of the tables it wrote, in the order developers, cloud_resources,
+    permissions, then the change_log version (see changes.log_changes). Writers of a table queue on its version
+    row only for that final step, and since none touches a data row after its first bump, a writer holding a
+    version row never waits on one holding a data row.
+    """
+    return (
+        update(TableVersion)
+        .where(TableVersion.table_name.in_(tables))
+        .values(version=TableVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def _versions_query(tables):
+    return select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(tables))
+
+def _make_etag(rows, tables):
+    versions = {table_name: version for table_name, version in rows}
+    # Without a version row the table's changes can't be tracked, so never claim a match
+    if any(table not in versions for table in tables):
+        return None
+    return 'W/"' + ".".join(str(versions[table]) for table in tables) + '"'
+
+def check_etag(request: Request, response: Response, etag: Optional[str]):
+    """Answer If-None-Match with 304 when it names etag, otherwise send etag with the response"""
+    if etag is None:
+        return
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+def table_etag(db: Session, *tables) -> Optional[str]:
+    """Weak ETag built from the current versions of tables"""
+    return _make_etag(db.execute(_versions_query(tables)), tables)
+
+async def async_table_etag(db: AsyncSession, *tables) -> Optional[str]:
+    """Async counterpart of table_etag"""
+    return _make_etag(await db.execute(_versions_query(tables)), tables)
+
+def etag_for(*tables):
+    """Route dependency that answers If-None-Match with 304 from the versions of the tables a route reads
+
+    Versions are read before the route's own query, so the data served is never older than its ETag.
+    """
+    def check_table_etag(request: Request, response: Response, db: Session = Depends(get_db)):
+        check_etag(request, response, table_etag(db, *tables))
+    return check_table_etag
+
+def async_etag_for(*tables):
+    """Async counterpart of etag_for"""
+    async def check_table_etag(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+        check_etag(request, response, await async_table_etag(db, *tables))
+    return check_table_etag
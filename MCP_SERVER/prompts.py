@@ -18,7 +18,7 @@ def register_prompts(mcp):
 I need to check what cloud resources {developer_name} has access to as part of their onboarding process.
 
 Please use the following tools to gather this information:
-1. First, use list_developers to find the developer ID for {developer_name}
+1. First, use find_developer with name="{developer_name}" to find their developer ID
 2. Then use lookup_resources_for_developer with their ID to see all their cloud access
 3. Provide a summary of:
    - Total number of resources they can access
@@ -42,9 +42,9 @@ This will help ensure they have the right access for their role.
 I need to conduct a security audit to find all developers who have write (WRITE or RW) access to cloud resources{cloud_filter}.
 
 Please help me by:
-1. Using list_developers to get all developers in the system
-2. For each developer, use lookup_resources_for_developer{cloud_param} to check their permissions
-3. Filter and highlight developers who have:
+1. Using audit_write_access{cloud_param} to get every WRITE and RW grant with developer and resource details
+2. Using get_permission_stats{cloud_param} with group_by='developer' to see how much access each developer holds
+3. Highlight developers who have:
    - WRITE access to any resources
    - RW (read-write) access to any resources
 4. Organize the results by cloud provider and permission level
@@ -64,7 +64,7 @@ This audit will help ensure we follow the principle of least privilege.
 I need to investigate who has access to "{resource_name}" for debugging/compliance purposes.
 
 Please help by:
-1. Using list_cloud_resources to find the resource ID for "{resource_name}"
+1. Using search_cloud_resources with query="{resource_name}" to find the resource ID (take the best match)
 2. Using get_resource_permissions with that resource ID to see all developers with access
 3. Provide a breakdown showing:
    - All developers who can access this resource
@@ -87,9 +87,9 @@ I need to analyze our {cloud_type} footprint to understand developer access patt
 
 Please analyze by:
 1. Using list_cloud_resources with cloud_type="{cloud_type}" to see all {cloud_type} resources
-2. Using list_developers to get all developers
-3. For each developer, checking their {cloud_type} access using lookup_resources_for_developer
-4. Providing analysis including:
+2. Using get_permission_stats with cloud_type="{cloud_type}" to get grant counts by permission level,
+   per developer and per resource, in a single call
+3. Providing analysis including:
    - Total {cloud_type} resources in the system
    - Number of developers with {cloud_type} access
    - Most commonly accessed {cloud_type} resources
@@ -110,10 +110,9 @@ This analysis will help with cloud migration and cost optimization planning.
 I need to identify developers with the most cloud access (at least {minimum_resources} resources) for security review.
 
 Please help by:
-1. Using list_developers to get all developers
-2. For each developer, using lookup_resources_for_developer to count their total access
-3. Filtering to show only developers with access to {minimum_resources}+ resources
-4. For high-access developers, provide:
+1. Using find_high_privilege_developers with min_resources={minimum_resources} to get every developer
+   with access to {minimum_resources}+ resources, already counted per cloud provider
+2. For high-access developers, provide:
    - Total number of resources they can access
    - Breakdown by cloud provider (AWS, AZURE, GCP)
    - Number of resources with write access (WRITE or RW)
@@ -97,34 +97,72 @@ def register_tools(mcp):
             return {"error": f"Unexpected error: {str(e)}"}
 
     @mcp.tool
-    def list_cloud_resources(cloud_type: str = None) -> dict:
-        """List all cloud resources, optionally filtered by cloud type (AWS, AZURE, GCP)."""
+    def find_developer(name: str = None, email: str = None) -> dict:
+        """Find a developer's ID by exact email or by name (case-insensitive). Pass one of the two."""
         import os
         
         api_url = os.environ.get("API_URL", "http://localhost:8000")
         
+        if (name is None) == (email is None):
+            return {"error": "Pass exactly one of name or email"}
+        params = {"email": email} if email is not None else {"name": name}
+        
         try:
-            response = requests.get(f"{api_url}/cloud_resources/")
-            if response.status_code != 200:
-                return {"error": f"Failed to fetch cloud resources: {response.status_code}"}
+            response = requests.get(f"{api_url}/developers/lookup", params=params)
+            if response.status_code == 404:
+                return {"error": f"No developer found with {next(iter(params))} '{next(iter(params.values()))}'"}
+            elif response.status_code != 200:
+                return {"error": f"Failed to look up developer: {response.status_code}"}
             
-            all_resources = response.json()
+            developers = response.json()
+            return {
+                "developers": developers,
+                "total_count": len(developers),
+                "summary": f"Found {len(developers)} matching developer(s)"
+            }
+            
+        except requests.exceptions.RequestException as e:
+            return {"error": f"API request failed: {str(e)}"}
+        except Exception as e:
+            return {"error": f"Unexpected error: {str(e)}"}
+
+    @mcp.tool
+    def list_cloud_resources(cloud_type: str = None, name_prefix: str = None) -> dict:
+        """List all cloud resources, optionally filtered by cloud type (AWS, AZURE, GCP) or name prefix."""
+        import os
+        
+        api_url = os.environ.get("API_URL", "http://localhost:8000")
+        
+        # Filter in the API and walk every page, rather than filtering the first page here
+        params = {"limit": 1000}
+        if cloud_type:
+            params["cloud_type"] = cloud_type.upper()
+        if name_prefix:
+            params["name_prefix"] = name_prefix
+        
+        try:
+            resources = []
+            cursor = ""
+            while cursor is not None:
+                response = requests.get(f"{api_url}/cloud_resources/", params={**params, "cursor": cursor})
+                if response.status_code != 200:
+                    return {"error": f"Failed to fetch cloud resources: {response.status_code}"}
+                page = response.json()
+                resources.extend(page["items"])
+                cursor = page["next_cursor"]
             
-            # Filter by cloud_type if provided
             if cloud_type:
-                cloud_type_upper = cloud_type.upper()
-                filtered_resources = [r for r in all_resources if r.get('cloud_type', '').upper() == cloud_type_upper]
                 return {
-                    "resources": filtered_resources,
-                    "total_count": len(filtered_resources),
-                    "filtered_by": cloud_type_upper,
-                    "summary": f"Found {len(filtered_resources)} {cloud_type_upper} resource(s)"
+                    "resources": resources,
+                    "total_count": len(resources),
+                    "filtered_by": params["cloud_type"],
+                    "summary": f"Found {len(resources)} {params['cloud_type']} resource(s)"
                 }
             else:
                 return {
-                    "resources": all_resources,
-                    "total_count": len(all_resources),
-                    "summary": f"Found {len(all_resources)} total resource(s)"
+                    "resources": resources,
+                    "total_count": len(resources),
+                    "summary": f"Found {len(resources)} total resource(s)"
                 }
             
         except requests.exceptions.RequestException as e:
@@ -132,6 +170,30 @@ def register_tools(mcp):
         except Exception as e:
             return {"error": f"Unexpected error: {str(e)}"}
 
+    @mcp.tool
+    def search_cloud_resources(query: str, limit: int = 5) -> dict:
+        """Find cloud resources whose name best matches free text such as 'AWS S3 Bucket', best match first."""
+        import os
+        
+        api_url = os.environ.get("API_URL", "http://localhost:8000")
+        
+        try:
+            response = requests.get(f"{api_url}/cloud_resources/search", params={"q": query, "limit": limit})
+            if response.status_code != 200:
+                return {"error": f"Failed to search cloud resources: {response.status_code}"}
+            
+            matches = response.json()
+            return {
+                "matches": matches,
+                "total_count": len(matches),
+                "summary": f"Found {len(matches)} resource(s) matching '{query}'"
+            }
+            
+        except requests.exceptions.RequestException as e:
+            return {"error": f"API request failed: {str(e)}"}
+        except Exception as e:
+            return {"error": f"Unexpected error: {str(e)}"}
+
     @mcp.tool
     def get_resource_permissions(resource_id: int) -> dict:
         """Get all developers who have permissions for a specific cloud resource."""
@@ -183,4 +245,94 @@ def register_tools(mcp):
         except requests.exceptions.RequestException as e:
             return {"error": f"API request failed: {str(e)}"}
         except Exception as e:
-            return {"error": f"Unexpected error: {str(e)}"}
\ No newline at end of file
+            return {"error": f"Unexpected error: {str(e)}"}
+
+    @mcp.tool
+    def get_permission_stats(cloud_type: str = None, group_by: str = None) -> dict:
+        """Count permissions by cloud type and level, per developer and per resource, in one call.
+
+        group_by narrows the result to "cloud_type", "developer" or "resource".
+        """
+        import os
+        
+        api_url = os.environ.get("API_URL", "http://localhost:8000")
+        
+        params = {}
+        if cloud_type:
+            params["cloud_type"] = cloud_type.upper()
+        if group_by:
+            params["group_by"] = group_by
+        
+        try:
+            response = requests.get(f"{api_url}/stats/permissions", params=params)
+            if response.status_code != 200:
+                return {"error": f"Failed to fetch permission stats: {response.status_code}"}
+            
+            stats = response.json()
+            stats["summary"] = f"Found {stats['total']} permission(s)" + (
+                f" on {params['cloud_type']} resources" if cloud_type else ""
+            )
+            return stats
+            
+        except requests.exceptions.RequestException as e:
+            return {"error": f"API request failed: {str(e)}"}
+        except Exception as e:
+            return {"error": f"Unexpected error: {str(e)}"}
+
+    @mcp.tool
+    def find_high_privilege_developers(min_resources: int = 5, cloud_type: str = None, write_only: bool = False) -> dict:
+        """Find developers with access to at least min_resources resources, with per-cloud and write-grant counts."""
+        import os
+        
+        api_url = os.environ.get("API_URL", "http://localhost:8000")
+        
+        params = {"min_resources": min_resources, "write_only": write_only, "limit": 1000}
+        if cloud_type:
+            params["cloud_type"] = cloud_type.upper()
+        
+        try:
+            developers = []
+            cursor = ""
+            while cursor is not None:
+                response = requests.get(f"{api_url}/developers/high-privilege", params={**params, "cursor": cursor})
+                if response.status_code != 200:
+                    return {"error": f"Failed to fetch high-privilege developers: {response.status_code}"}
+                page = response.json()
+                developers.extend(page["items"])
+                cursor = page["next_cursor"]
+            
+            return {
+                "developers": developers,
+                "total_count": len(developers),
+                "summary": f"Found {len(developers)} developer(s) with access to {min_resources}+ resource(s)"
+            }
+            
+        except requests.exceptions.RequestException as e:
+            return {"error": f"API request failed: {str(e)}"}
+        except Exception as e:
+            return {"error": f"Unexpected error: {str(e)}"}
+
+    @mcp.tool
+    def audit_write_access(cloud_type: str = None) -> dict:
+        """List every WRITE or RW grant with developer and resource details, grouped by cloud and level."""
+        import os
+        
+        api_url = os.environ.get("API_URL", "http://localhost:8000")
+        
+        params = {"cloud_type": cloud_type.upper()} if cloud_type else {}
+        
+        try:
+            response = requests.get(f"{api_url}/audit/write-access", params=params)
+            if response.status_code != 200:
+                return {"error": f"Failed to fetch write-access audit: {response.status_code}"}
+            
+            audit = response.json()
+            audit["summary"] = f"Found {audit['total']} write grant(s)" + (
+                f" on {params['cloud_type']} resources" if cloud_type else ""
+            )
+            return audit
+            
+        except requests.exceptions.RequestException as e:
+            return {"error": f"API request failed: {str(e)}"}
+        except Exception as e:
+            return {"error": f"Unexpected error: {str(e)}"}